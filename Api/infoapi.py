@@ -1,24 +1,153 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patheffects as path_effects
 
-# Details for the utilization of API
-API_KEY = "7fee06d41d0344a7b06b6907341c8a2b"
+# Details for the utilization of API: the key is read from the environment
+API_KEY_VARIABLE = "FOOTBALL_DATA_API_KEY"
 BASE_URL = "https://api.football-data.org/v4"
+REQUEST_TIMEOUT = 30
+# Quota of the free tier
+REQUESTS_PER_MINUTE = 10
+# Seconds a cached response is reused
+CACHE_TTL = 3600
+# Times a throttled (429) request is queued again before giving up
+MAX_RETRIES = 3
+# Squads of each competition loaded by load_competition_players, one Parquet file per competition
+SQUADS_DIR = "Api/squads"
+# Squad requests in flight (they all wait for the quota anyway)
+SQUAD_WORKERS = 4
+
+
+class MinuteQuota:
+    '''
+    Sliding one-minute window of at most `requests_per_minute` requests. acquire() waits
+    for a free slot instead of letting the request fail, and pause() holds every caller
+    until the server says its quota is back.
+    '''
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, window=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.window = window
+        self.sent = deque()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.sent and now - self.sent[0] >= self.window:
+                    self.sent.popleft()
+                if now >= self.paused_until and len(self.sent) < self.requests_per_minute:
+                    self.sent.append(now)
+                    return
+                wait = max(self.paused_until - now, self.sent[0] + self.window - now if self.sent else 0)
+            time.sleep(max(wait, 0.01))
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class FootballDataClient:
+    '''
+    football-data.org client: one keep-alive session, requests queued within the
+    minute quota, and a response cache keyed by endpoint, so the same resource asked
+    twice (e.g. draw_team then get_players of a team) costs one request.
+
+    Args:
+        api_key (str): The API key, read from the FOOTBALL_DATA_API_KEY environment variable by default.
+        requests_per_minute (int): The quota of the plan.
+        cache_ttl (float): Seconds a cached response is reused.
+    '''
+
+    def __init__(self, api_key=None, base_url=BASE_URL, requests_per_minute=REQUESTS_PER_MINUTE, cache_ttl=CACHE_TTL):
+        self.base_url = base_url
+        self.cache_ttl = cache_ttl
+        self.quota = MinuteQuota(requests_per_minute)
+        self.cache = {}  # endpoint -> (fetch time, JSON)
+        self.cache_lock = threading.Lock()
+        self.requests_sent = 0
+        self.session = requests.Session()
+        api_key = api_key or os.environ.get(API_KEY_VARIABLE)
+        if api_key:
+            self.session.headers["X-Auth-Token"] = api_key
+        else:
+            print(f"No football-data.org API key: set {API_KEY_VARIABLE} (anonymous requests are very limited)")
+
+    def get(self, endpoint, **params):
+        '''
+        JSON of an endpoint (e.g. "teams/66"), from the cache when fresh. Throttled
+        requests wait for the quota reset and are sent again; None on any other error.
+        '''
+        key = endpoint + "".join(f"&{name}={value}" for name, value in sorted(params.items()))
+        with self.cache_lock:
+            cached = self.cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        for attempt in range(MAX_RETRIES + 1):
+            self.quota.acquire()
+            with self.cache_lock:
+                self.requests_sent += 1
+            try:
+                response = self.session.get(f"{self.base_url}/{endpoint}", params=params or None, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                print(f"Error fetching {endpoint}: {e}")
+                return None
+            if response.headers.get("X-Requests-Available-Minute") == "0":
+                self.quota.pause(_reset_seconds(response))
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                self.quota.pause(_reset_seconds(response))
+                continue
+            if response.status_code != 200:
+                print(f"Error fetching {endpoint}: {response.status_code} - {response.text}")
+                return None
+            data = response.json()
+            with self.cache_lock:
+                self.cache[key] = (time.monotonic(), data)
+            return data
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+
+def _reset_seconds(response):
+    '''Seconds until the quota of the server is reset (X-RequestCounter-Reset, else Retry-After, else a minute).'''
+    for header in ("X-RequestCounter-Reset", "Retry-After"):
+        try:
+            return max(float(response.headers[header]), 0.0)
+        except (KeyError, ValueError):
+            continue
+    return 60.0
+
+
+_client = None
+
+def get_client():
+    '''Return the client shared by the functions of this module.'''
+    global _client
+    if _client is None:
+        _client = FootballDataClient()
+    return _client
 
 ''' Definition of a function which creates a dataframe with information on all the teams of the
  chosen league. '''
 
 
-def get_teams(competition_id):
-    url = f"{BASE_URL}/competitions/{competition_id}/teams"
-    headers = {"X-Auth-Token": API_KEY}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        teams = response.json()["teams"]  # list with all the teams of the league
+def get_teams(competition_id, client=None):
+    data = (client or get_client()).get(f"competitions/{competition_id}/teams")
+    if data is not None:
+        teams = data["teams"]  # list with all the teams of the league
     else:
-        print(f"Error fetching teams: {response.status_code} - {response.text}")
         return []
     teams_list = []
     for team in teams:
@@ -32,24 +161,21 @@ def get_teams(competition_id):
         })
     teams_df = pd.DataFrame(teams_list)
     print(teams_df)
+    return teams_df
 
 
 ''' Definition of a function which creates a dataframe with information on all the players of the
 chosen team. '''
 
 
-def get_players(team_id):
-    url = f"{BASE_URL}/teams/{team_id}"
-    headers = {"X-Auth-Token": API_KEY}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        squad = response.json()["squad"]  # all the players of the team
-        team_data = response.json()
+def get_players(team_id, client=None):
+    team_data = (client or get_client()).get(f"teams/{team_id}")  # cached: draw_team then get_players is one request
+    if team_data is not None:
+        squad = team_data["squad"]  # all the players of the team
         team = team_data.get("name", "Unknown Team") 
         # method to get the name of the team which is not included 
         # in the information set of the players
     else:
-        print(f"Error fetching teams: {response.status_code} - {response.text}")
         return []
     players_list = []
     for player in squad:
@@ -67,11 +193,96 @@ def get_players(team_id):
     return players_df
 
 
+''' Definition of a function which loads the players of every team of a competition in one typed
+data frame, kept on disk so that later calls only fetch the squads that changed. '''
+
+PLAYER_DTYPES = {
+    "Team ID": "Int32",
+    "Team Name": "string",
+    "Team Last Updated": "datetime64[ns, UTC]",
+    "Player ID": "Int32",
+    "Player Name": "string",
+    "Position": "category",
+    "Date of Birth": "datetime64[ns]",
+    "Nationality": "category",
+}
+
+
+def squad_rows(team):
+    '''Rows of PLAYER_DTYPES of a team JSON (with its squad).'''
+    return [
+        {
+            "Team ID": team["id"],
+            "Team Name": team.get("name"),
+            "Team Last Updated": team.get("lastUpdated"),
+            "Player ID": player.get("id"),
+            "Player Name": player.get("name"),
+            "Position": player.get("position"),
+            "Date of Birth": player.get("dateOfBirth"),
+            "Nationality": player.get("nationality"),
+        }
+        for player in team.get("squad") or []
+    ]
+
+
+def typed_players(rows):
+    players_df = pd.DataFrame(rows, columns=list(PLAYER_DTYPES))
+    players_df["Team Last Updated"] = pd.to_datetime(players_df["Team Last Updated"], utc=True, errors="coerce")
+    players_df["Date of Birth"] = pd.to_datetime(players_df["Date of Birth"], errors="coerce")
+    return players_df.astype(PLAYER_DTYPES)
+
+
+def load_competition_players(competition_id, client=None, directory=SQUADS_DIR, max_workers=SQUAD_WORKERS):
+    '''
+    Players of every team of a competition: team id, position as a category, parsed
+    date of birth. The teams are listed (one request), then the squads not given by the
+    listing are fetched concurrently within the quota. The frame is saved in `directory`;
+    on later calls, the squads of the teams whose lastUpdated is unchanged are read from
+    it, and only the other ones are fetched.
+    '''
+    client = client or get_client()
+    data = client.get(f"competitions/{competition_id}/teams")
+    if data is None:
+        return typed_players([])
+    teams = data["teams"]
+
+    path = os.path.join(directory, f"competition_{competition_id}.parquet")
+    saved = pd.read_parquet(path) if os.path.exists(path) else typed_players([])
+    saved_updates = saved.groupby("Team ID")["Team Last Updated"].first().to_dict()
+
+    kept, fetched, to_fetch = [], [], []
+    for team in teams:
+        updated = pd.to_datetime(team.get("lastUpdated"), utc=True, errors="coerce")
+        if team["id"] in saved_updates and saved_updates[team["id"]] == updated and not pd.isna(updated):
+            kept.append(team["id"])
+        elif team.get("squad"):
+            fetched += squad_rows(team)  # the listing already holds the squad
+        else:
+            to_fetch.append(team["id"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for team_id, team in zip(to_fetch, pool.map(lambda team_id: client.get(f"teams/{team_id}"), to_fetch)):
+            if team is None:
+                print(f"Squad of team {team_id} not loaded")
+                kept.append(team_id)  # its saved squad, if any, is kept
+                continue
+            fetched += squad_rows(team)
+    print(f"{len(teams) - len(kept)} of {len(teams)} squads loaded, {len(to_fetch)} requests")
+
+    players_df = pd.concat(
+        [saved[saved["Team ID"].isin(kept)], typed_players(fetched)], ignore_index=True
+    ).astype(PLAYER_DTYPES)
+    os.makedirs(directory, exist_ok=True)
+    players_df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return players_df
+
+
 '''Define a function to plot a football team on the pitch'''
 
-def draw_team(team_id):
+def draw_team(team_id, client=None):
     
-    players_df = get_players(team_id)
+    players_df = get_players(team_id, client)
     
     role_positions = {
         "Goalkeeper" : [(50,98-i*3) for i in range(10)],
@@ -0,0 +1,442 @@
+import pandas as pd
+import os
+
+from scraping_data.codes.fetching import fetch
+from scraping_data.codes.pipeline import fetch_and_parse, parse_pool
+from scraping_data.codes.sink import ParquetPartSink
+from scraping_data.codes.parsing import find_table, find_first_table, cell_links, table_to_frame
+from scraping_data.codes.checkpoint import ScrapeCheckpoint, DONE, FAILED
+from scraping_data.codes.player_index import PlayerIndex, player_id_from_url, REFRESH_INTERVAL
+from scraping_data.codes.http_cache import current_season
+from scraping_data.codes.dataset import DATASET_DIR, convert_csv, export_csv, merge_partitions
+from scraping_data.codes.schema import align
+from scraping_data.codes.metrics import get_metrics
+
+
+# League descriptors: adding a league is a new entry here.
+# '{season}' is replaced by the season, e.g. '2024-2025'.
+LEAGUES = {
+    'top5': {
+        'key': 'top5',
+        'comp_id': 'Big5',
+        'url': 'https://fbref.com/en/comps/Big5/{season}/{season}-Big-5-European-Leagues-Stats',
+        'clubs_table_id': 'big5_table',
+        'players_table_ids': ['stats_standard_20', 'stats_standard_13', 'stats_standard_12', 'stats_standard_9', 'stats_standard_11'],
+        'output_path': 'scraping_data/results_csv/players_stats_top5.csv',
+    },
+    'eredivisie': {
+        'key': 'eredivisie',
+        'comp_id': '23',
+        'url': 'https://fbref.com/en/comps/23/{season}/{season}-Eredivisie-Stats',
+        'clubs_table_id': 'results{season}231_overall',
+        'players_table_ids': ['stats_standard_23'],
+        'output_path': 'scraping_data/results_csv/players_stats_eredivisie.csv',
+    },
+    'primeiraliga': {
+        'key': 'primeiraliga',
+        'comp_id': '32',
+        'url': 'https://fbref.com/en/comps/32/{season}/{season}-Primeira-Liga-Stats',
+        'clubs_table_id': 'results{season}321_overall',
+        'players_table_ids': ['stats_standard_32'],
+        'output_path': 'scraping_data/results_csv/players_stats_primeiraliga.csv',
+    },
+    # The leagues below have not been scraped yet: their table ids follow the pattern of
+    # the others but are unverified, so they are left out of DEFAULT_LEAGUES
+    'serieb': {
+        'key': 'serieb',
+        'comp_id': '18',
+        'url': 'https://fbref.com/en/comps/18/{season}/{season}-Serie-B-Stats',
+        'clubs_table_id': 'results{season}181_overall',
+        'players_table_ids': ['stats_standard_18'],
+        'output_path': 'scraping_data/results_csv/players_stats_serieb.csv',
+    },
+    'proleague': {
+        'key': 'proleague',
+        'comp_id': '37',
+        'url': 'https://fbref.com/en/comps/37/{season}/{season}-Belgian-Pro-League-Stats',
+        'clubs_table_id': 'results{season}371_overall',
+        'players_table_ids': ['stats_standard_37'],
+        'output_path': 'scraping_data/results_csv/players_stats_proleague.csv',
+    },
+}
+
+# Leagues scraped by default by the scheduler and reparse.py
+DEFAULT_LEAGUES = ['top5', 'eredivisie', 'primeiraliga']
+
+# Number of players buffered in memory before they are flushed to the Parquet sink
+BATCH_SIZE = 50
+
+# Tables of a player page, by label, with the ids FBref uses for them (all competitions
+# first, then domestic leagues). Columns of the tables other than "Standard" are prefixed
+# with their label in the records, e.g. "Shooting : Standard : Sh".
+PLAYER_TABLES = {
+    'Standard': ['stats_standard_expanded', 'stats_standard_dom_lg'],
+    'Shooting': ['stats_shooting_expanded', 'stats_shooting_dom_lg'],
+    'Passing': ['stats_passing_expanded', 'stats_passing_dom_lg'],
+    'Defense': ['stats_defense_expanded', 'stats_defense_dom_lg'],
+    'Possession': ['stats_possession_expanded', 'stats_possession_dom_lg'],
+}
+# Tables extracted from each player page: all of them come with the same fetch
+EXTRACTED_TABLES = ['Standard', 'Shooting', 'Passing', 'Defense', 'Possession']
+
+# A season row of a player is identified by these columns in every table
+ROW_KEYS = ['Season', 'Squad', 'Comp']
+# Columns repeated by every table, only kept from the standard one
+SHARED_COLUMNS = ['Age', 'Country', 'LgRank', 'MP', '90s', 'Matches']
+
+ALLOWED_SEASONS = ['2010-2011', '2011-2012', '2012-2013', '2013-2014', '2014-2015', '2015-2016', '2016-2017', '2017-2018', '2018-2019', '2019-2020', '2020-2021', '2021-2022',
+    '2022-2023', '2023-2024', '2024-2025']
+
+
+def get_league(league):
+    '''Return a league descriptor from its key in LEAGUES, or the descriptor itself.'''
+    if isinstance(league, dict):
+        return league
+    try:
+        return LEAGUES[league]
+    except KeyError:
+        raise ValueError(f"Unknown league: {league}. Known leagues: {', '.join(LEAGUES)}")
+
+
+def league_url(league, season):
+    '''Build the league stats URL for a season.'''
+    return get_league(league)['url'].format(season=season)
+
+
+def parts_directory(league, season):
+    '''Directory of the Parquet parts written while scraping a season.'''
+    return os.path.join(os.path.splitext(get_league(league)['output_path'])[0] + '_parts', season)
+
+
+
+def rename_columns_and_flatten(df):
+    new_columns = []
+    for col in df.columns:
+        # If the 1st index starts with "Unnamed", keep only the 2nd index's name
+        if str(col[0]).startswith("Unnamed"):
+            new_columns.append(col[1])
+        else:
+            # Sinon, on combine le niveau supérieur et le niveau inférieur avec ":"
+            new_columns.append(f"{col[0]} : {col[1]}")
+
+    # apply new columns names
+    df.columns = new_columns
+
+    return df
+
+
+
+def get_club_urls(league_url, season, league):
+    """Get URLs for all clubs in the league for a specific season"""
+    league = get_league(league)
+    response = fetch(league_url)
+    if response is None or response.status_code != 200:
+        status = 'network error' if response is None else f'HTTP {response.status_code}'
+        raise ValueError(f"Could not fetch the league page ({status}): {league_url}")
+
+    # Replace dynamic ID based on the season
+    table_id = league['clubs_table_id'].format(season=season)
+    clubs_table = find_table(response.text, table_id)
+
+    if clubs_table is None:
+        raise ValueError(f"Could not find the clubs table with ID: {table_id}")
+
+    return ["https://fbref.com" + link for link in cell_links(clubs_table, "td", "team")]
+
+
+def parse_club_page(html, league):
+    """Player links of a club page, as URLs of their all-competitions stats pages."""
+    players_table = find_first_table(html, get_league(league)['players_table_ids'])
+
+    if players_table is None:
+        return None
+
+    player_links = []
+    for player_link in cell_links(players_table, "th", "player"):
+        # Build complete URL
+        linkbefore = "https://fbref.com" + player_link
+        linkmid = linkbefore.split("/")
+        linkmid.insert(6, "all_comps")
+        full_url = "/".join(linkmid) + "-Stats---All-Competitions"
+
+        player_links.append(full_url)
+
+    return player_links
+
+
+def club_player_urls(club_url, league):
+    """Player links of a club; raises ValueError when the page cannot be fetched or has no players table."""
+    response = fetch(club_url)
+    if response is None or response.status_code != 200:
+        status = 'network error' if response is None else f'HTTP {response.status_code}'
+        raise ValueError(f"Could not fetch the club page ({status}): {club_url}")
+
+    player_links = parse_club_page(response.text, league)
+
+    if player_links is None:
+        raise ValueError(f"No players table for {club_url}")
+
+    return player_links
+
+
+def scrape_club_players(club_url, league):
+    """Get player links for a specific club"""
+    try:
+        return club_player_urls(club_url, league)
+    except ValueError as e:
+        print(f"Warning: {e}")
+        return []
+
+
+def player_name_from_url(player_url):
+    """Player name derived from the slug of an FBref player URL."""
+    return player_url.split("/")[-1].replace("-Stats---All-Competitions", "").replace("-", " ")
+
+
+def table_rows(html, label):
+    """Rows of one player page table, with prefixed column names for the tables other than "Standard"; None if absent."""
+    table = find_first_table(html, PLAYER_TABLES[label])
+    if table is None:
+        return None
+    frame = table_to_frame(table)
+    if label == 'Standard':
+        return frame
+    keys = [col for col in ROW_KEYS if col in frame.columns]
+    metrics = [col for col in frame.columns if col not in ROW_KEYS and col not in SHARED_COLUMNS]
+    frame = frame.loc[:, ~frame.columns.duplicated()][keys + metrics]
+    frame.columns = keys + [f'{label} : {col}' for col in metrics]
+    return frame.drop_duplicates(subset=keys)
+
+
+def parse_player_page(html, player_url, tables=None):
+    """
+    Build the statistics DataFrame of a player from the page HTML: one row per season
+    (and club and competition), with the columns of every table of `tables`
+    (EXTRACTED_TABLES by default) joined on the standard table, allowed seasons only.
+    Runs in the parsing processes of the pipeline.
+    """
+    player_name = player_name_from_url(player_url)
+
+    try:
+        stats_table = table_rows(html, 'Standard')
+
+        if stats_table is None:
+            print(f"No stats table found for URL: {player_url}")
+            return pd.DataFrame()
+
+        if stats_table.empty:
+            print(f"Error reading HTML table for {player_name}: no rows")
+            return pd.DataFrame()
+
+        # The other tables of the same page, joined season by season
+        for label in tables or EXTRACTED_TABLES:
+            if label == 'Standard':
+                continue
+            other = table_rows(html, label)
+            keys = [col for col in ROW_KEYS if col in stats_table.columns]
+            if other is not None and not other.empty and set(keys) <= set(other.columns):
+                stats_table = stats_table.merge(other, on=keys, how='left')
+
+        # add columns 'player' and 'player id' first
+        stats_table.insert(0, 'Player', player_name, allow_duplicates=True)
+        stats_table.insert(1, 'Player ID', player_id_from_url(player_url), allow_duplicates=True)
+
+        # keep only allowed seasons
+        season_column = 'Season'
+        if season_column in stats_table.columns:
+            stats_table = stats_table[stats_table[season_column].isin(ALLOWED_SEASONS)]
+
+        # canonical columns and compact dtypes, whatever the page layout
+        return align(stats_table)
+    except Exception as e:
+        print(f"Error scraping stats for {player_name}: {e}")
+        return pd.DataFrame()
+
+
+def parse_stats_player(response, player_url):
+    """Build the statistics DataFrame of a player from the fetched page."""
+    if response is None or response.status_code != 200:
+        # a throttled or error page is not a page without statistics
+        if response is not None:
+            print(f"HTTP {response.status_code} for {player_url}")
+        return pd.DataFrame()
+    return parse_player_page(response.text, player_url)
+
+
+def scrape_stats_player(player_url, existing_players):
+
+    """Get statistics for a specific player if not already in the dataset."""
+
+    player_name = player_name_from_url(player_url)
+
+    if player_name in existing_players:
+        print(f"Skipping {player_name} (already exists in the dataset).")
+        return pd.DataFrame()
+
+    return parse_stats_player(fetch(player_url), player_url)
+
+
+
+def main(league, season, all_players_stats=None, existing_players=(), checkpoint=None, index=None, persist=None):
+    '''
+    Main function to scrape stats of a league for a specific season, resuming from the checkpoint store.
+    Only players missing from the player index, or stale ones for the ongoing season, are fetched.
+    Request metrics are written to METRICS_PROM and METRICS_JSON (see metrics.py) at the end.
+
+    The scraped rows are kept in Parquet parts until they are saved: `persist` is called
+    with the assembled rows and the parts are only removed once it returns. Without it,
+    the parts are kept and the caller removes them with clear_parts once the rows are saved.
+    '''
+    league = get_league(league)
+    key = league['key']
+    checkpoint = checkpoint or ScrapeCheckpoint()
+    index = index or PlayerIndex()
+    metrics = get_metrics()
+    metrics.reset()
+
+    # Pages of the ongoing season are worth fetching again once stale
+    max_age = REFRESH_INTERVAL if season == current_season() else None
+
+    # Get club URLs; without the league page there is nothing to scrape for this season
+    try:
+        club_urls = get_club_urls(league_url(league, season), season, league)
+    except ValueError as e:
+        print(f'Error for {key} {season}: {e}')
+        return all_players_stats if all_players_stats is not None else pd.DataFrame()
+    checkpoint.add(key, season, club_urls, 'club')
+
+    # Rows are flushed to disk in batches; parts of an interrupted run are kept
+    sink = ParquetPartSink(parts_directory(league, season))
+
+    def flush(club_id):
+        sink.flush(club_id)
+        index.commit()
+        checkpoint.commit()
+
+    def scrape_players(player_urls, batch_name):
+        '''Fetch, parse and record player pages; returns the URLs that failed.'''
+        failed = []
+        batch_players = 0
+        # Pages are fetched by network threads and parsed by the process pool of the run;
+        # results come back in the order of player_urls
+        for player_url, response, player_stats in fetch_and_parse(player_urls, parse_player_page, pool=pool):
+            print(f'Scraping player: {player_url}')
+            if response is None or response.status_code != 200:
+                error = 'network error' if response is None else f'HTTP {response.status_code}'
+                checkpoint.mark(key, season, player_url, FAILED, error=error)
+                failed.append(player_url)
+            else:
+                sink.append(player_stats)
+                checkpoint.mark(key, season, player_url, DONE, row_count=len(player_stats))
+                seasons = player_stats['Season'].value_counts().to_dict() if not player_stats.empty else {}
+                index.record(player_url, player_name_from_url(player_url), key, seasons)
+            batch_players += 1
+
+            # Flush the batch, then commit: a restart never skips unsaved rows
+            if batch_players == BATCH_SIZE:
+                flush(batch_name)
+                batch_players = 0
+        flush(batch_name)
+        return failed
+
+    # Clubs with players that failed even after retries: {club_url: (number of players, failed player URLs)}
+    requeued = {}
+
+    # One parsing pool for the run: its processes are started once, not once per club
+    with parse_pool() as pool:
+        # Process each club that is not done yet
+        for club_url in checkpoint.todo(key, season, club_urls, max_age):
+            try:
+                print(f'Scraping club: {club_url}')
+                player_urls = club_player_urls(club_url, league)
+                club_id = club_url.split('/squads/')[1].split('/')[0]
+
+                # Skip players whose rows are already up to date
+                to_scrape = []
+                for player_url in index.filter(player_urls, season, key):
+                    player_name = player_name_from_url(player_url)
+                    if player_name in existing_players:
+                        print(f"Skipping {player_name} (already exists in the dataset).")
+                    else:
+                        to_scrape.append(player_url)
+                print(f'{len(player_urls) - len(to_scrape)} players up to date, {len(to_scrape)} to scrape')
+                checkpoint.add(key, season, to_scrape, 'player', parent=club_url)
+
+                failed = scrape_players(checkpoint.todo(key, season, to_scrape, max_age), club_id)
+                if failed:
+                    # the club stays open, so that a later run comes back for these players
+                    requeued[club_url] = (len(player_urls), failed)
+                    checkpoint.mark(key, season, club_url, FAILED, error=f'{len(failed)} players failed')
+                else:
+                    checkpoint.mark(key, season, club_url, DONE, row_count=len(player_urls))
+                checkpoint.commit()
+
+            except Exception as e:
+                checkpoint.mark(key, season, club_url, FAILED, error=str(e))
+                checkpoint.commit()
+                print(f'Error for club {club_url}: {e}')
+
+        # Failed players are tried once more at the end, once a throttled host has had time to recover
+        if requeued:
+            retry_urls = [player_url for _, failed in requeued.values() for player_url in failed]
+            print(f'Retrying {len(retry_urls)} failed players')
+            still_failed = set(scrape_players(retry_urls, 'requeued'))
+            for club_url, (n_players, failed) in requeued.items():
+                if still_failed.isdisjoint(failed):
+                    checkpoint.mark(key, season, club_url, DONE, row_count=n_players)
+            checkpoint.commit()
+
+    print('Scraping terminé.')
+
+    # Request metrics of the run: Prometheus textfile and JSON summary
+    metrics.write()
+    print(metrics.report())
+
+    # Assemble the dataset once, on top of the rows passed in
+    scraped = sink.read_all()
+    if all_players_stats is not None and not all_players_stats.empty:
+        all_players_stats = pd.concat([all_players_stats, scraped], ignore_index=True)
+    else:
+        all_players_stats = scraped
+
+    if persist is not None:
+        persist(all_players_stats)
+        sink.clear()
+    return all_players_stats
+
+
+def clear_parts(league, season):
+    '''Remove the Parquet parts of a run of main, once its rows are saved.'''
+    ParquetPartSink(parts_directory(get_league(league), season)).clear()
+
+
+
+def merge_into_dataset(league, scraped):
+    '''
+    Merge freshly scraped rows into the league partitions of the Parquet dataset, then
+    write the league CSV (output_path) again from them, for the notebook and the
+    tools that still read it.
+    '''
+    league = get_league(league)
+    # a CSV written before the dataset existed is loaded first, so that exporting keeps its rows
+    if not os.path.isdir(os.path.join(DATASET_DIR, f"league={league['key']}")) and os.path.exists(league['output_path']):
+        convert_csv(league)
+    seasons = merge_partitions(league['key'], scraped)
+    print(f"{league['key']}: {len(seasons)} season partitions updated")
+    export_csv(league)
+    print(f"{league['key']}: {league['output_path']} written")
+
+
+
+def main_with_existing_data(league, season):
+    league = get_league(league)
+
+    def persist(scraped):
+        if scraped.empty:
+            print('No new data scraped.')
+        else:
+            merge_into_dataset(league, scraped)
+
+    # Scrape new data for the given season: the player index decides what to fetch.
+    # The parts of the run are removed only once the rows are merged into the dataset
+    main(league, season, persist=persist)
@@ -1,35 +1,297 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import time
-import os
-import random
-import json
+'''
+Players of the top 7 leagues (top 5, Eredivisie, Primeira Liga) as one table, one row
+per (player, season).
+
+Usage (from the repository root):
+    python -m scraping_data.codes.FBref_top7 [--full]
+
+The table is built incrementally from the league partitions of dataset.py. An index
+keeps, for every (player, season) key hash, the league the row comes from and a hash
+of its values, plus a fingerprint of every source partition already merged. A build
+only looks at the seasons with a changed partition, resolves them again in league
+priority order and rewrites the top 7 seasons whose rows changed, then splices their
+rows into the CSV. Refreshing one league after a matchday does not rebuild the other
+seasons, and the result is always the one of --full.
+'''
+import argparse
+import csv
+import glob
 import io
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from scraping_data.codes.dataset import DATASET_DIR, FLOAT_FORMAT, partition_path, read_partition, write_partition, read_players_stats
+
+
+# Source leagues, by priority: a (player, season) found in several leagues is taken from the first one
+TOP7_LEAGUES = ['eredivisie', 'primeiraliga', 'top5']
+TOP7_KEY = 'top7'
+TOP7_DIR = 'scraping_data/results_parquet/players_stats_top7'
+TOP7_INDEX_DB = 'scraping_data/results_parquet/players_stats_top7_index.sqlite'
+TOP7_CSV = 'scraping_data/results_csv/players_stats_top7.csv'
+
+
+def _int64(hashes):
+    # SQLite integers are signed 64 bits
+    return hashes.to_numpy().view('int64')
+
+
+def row_keys(frame):
+    '''Hash of (player, season) per row; rows without a Player ID are keyed by name.'''
+    players = frame['Player ID'].astype('string').fillna('name:' + frame['Player'].astype('string'))
+    keys = pd.DataFrame({'player': players, 'season': frame['Season'].astype('string')})
+    return _int64(pd.util.hash_pandas_object(keys, index=False))
+
+
+def row_hashes(frame):
+    '''Hash of the values of each row, to tell updated rows from unchanged ones.'''
+    return _int64(pd.util.hash_pandas_object(frame, index=False))
+
+
+def partition_fingerprint(path):
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+
+class Top7Index:
+    '''
+    (player, season) hash index of the top 7 table.
+
+    `rows` maps each key hash to the league its row was taken from and the hash of
+    the row values; `sources` holds the fingerprint of every league partition merged.
+    '''
+
+    def __init__(self, path=TOP7_INDEX_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS rows (
+                key INTEGER PRIMARY KEY,
+                league TEXT NOT NULL,
+                season TEXT NOT NULL,
+                row_hash INTEGER NOT NULL
+            )'''
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS rows_season ON rows (season)')
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS sources (
+                league TEXT NOT NULL,
+                season TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (league, season)
+            )'''
+        )
+        self.db.commit()
+
+    def fingerprint(self, league_key, season):
+        row = self.db.execute(
+            'SELECT fingerprint FROM sources WHERE league = ? AND season = ?', (league_key, season)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, league_key, season, fingerprint):
+        self.db.execute(
+            'INSERT OR REPLACE INTO sources (league, season, fingerprint) VALUES (?, ?, ?)',
+            (league_key, season, fingerprint),
+        )
+
+    def sources(self):
+        '''(league, season) of every league partition merged.'''
+        return self.db.execute('SELECT league, season FROM sources').fetchall()
+
+    def delete_source(self, league_key, season):
+        self.db.execute('DELETE FROM sources WHERE league = ? AND season = ?', (league_key, season))
+
+    def season_rows(self, season):
+        '''{key: (league, row_hash)} of one season.'''
+        return {
+            key: (league, row_hash)
+            for key, league, row_hash in self.db.execute('SELECT key, league, row_hash FROM rows WHERE season = ?', (season,))
+        }
+
+    def upsert(self, league_key, season, keys, hashes):
+        self.db.executemany(
+            'INSERT OR REPLACE INTO rows (key, league, season, row_hash) VALUES (?, ?, ?, ?)',
+            [(int(key), league_key, season, int(row_hash)) for key, row_hash in zip(keys, hashes)],
+        )
+
+    def delete(self, keys):
+        self.db.executemany('DELETE FROM rows WHERE key = ?', [(int(key),) for key in keys])
+
+    def clear(self):
+        self.db.execute('DELETE FROM rows')
+        self.db.execute('DELETE FROM sources')
+        self.db.commit()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def changed_partitions(index, leagues=TOP7_LEAGUES, root=DATASET_DIR):
+    '''
+    {season: {league_key: fingerprint}} of the league partitions changed since the last
+    build; a partition merged before and since deleted has a None fingerprint.
+    '''
+    changed = {}
+    present = set()
+    for league_key in leagues:
+        for path in sorted(glob.glob(os.path.join(root, f'league={league_key}', 'Season=*', 'data.parquet'))):
+            season = os.path.basename(os.path.dirname(path))[len('Season='):]
+            present.add((league_key, season))
+            fingerprint = partition_fingerprint(path)
+            if index.fingerprint(league_key, season) != fingerprint:
+                changed.setdefault(season, {})[league_key] = fingerprint
+    for league_key, season in index.sources():
+        if (league_key, season) not in present:
+            changed.setdefault(season, {})[league_key] = None
+    return changed
+
+
+def merge_season(index, season, sources, leagues=TOP7_LEAGUES, root=DATASET_DIR, top7_root=TOP7_DIR):
+    '''
+    Bring one top 7 season up to date after the league partitions of `sources`
+    ({league_key: fingerprint}) changed. Ownership is resolved again over every league
+    of the season, by priority, so the result is the same as a full rebuild whatever
+    the build history; the partition is only rewritten when a row changed owner or values.
+    Returns the number of rows added, updated or removed.
+    '''
+    owners = index.season_rows(season)
+
+    frames = []
+    taken_keys, taken_hashes, taken_leagues = [], [], []
+    seen = set()
+    for league_key in leagues:
+        rows = read_partition(league_key, season, root)
+        if rows.empty:
+            continue
+        keys, hashes = row_keys(rows), row_hashes(rows)
+        # a (player, season) goes to the first league that has it, and its first row there
+        take = ~pd.Index(keys).duplicated(keep='first') & ~np.isin(keys, list(seen))
+        seen.update(keys.tolist())
+        frames.append(rows[take])
+        taken_keys.append(keys[take])
+        taken_hashes.append(hashes[take])
+        taken_leagues += [league_key] * int(take.sum())
+
+    keys = np.concatenate(taken_keys) if taken_keys else np.empty(0, 'int64')
+    hashes = np.concatenate(taken_hashes) if taken_hashes else np.empty(0, 'int64')
+    new_owners = dict(zip(keys.tolist(), zip(taken_leagues, hashes.tolist())))
+    removed = [key for key in owners if key not in new_owners]
+    updated = [key for key, owner in new_owners.items() if owners.get(key) != owner]
+
+    changes = len(removed) + len(updated)
+    if changes:
+        path = partition_path(TOP7_KEY, season, top7_root)
+        if frames:
+            write_partition(TOP7_KEY, season, pd.concat(frames, ignore_index=True), top7_root)
+        elif os.path.exists(path):
+            os.remove(path)
+        index.delete(removed)
+        for league_key in leagues:
+            owned = [key for key in updated if new_owners[key][0] == league_key]
+            index.upsert(league_key, season, owned, [new_owners[key][1] for key in owned])
+
+    for league_key, fingerprint in sources.items():
+        if fingerprint is None:
+            index.delete_source(league_key, season)
+        else:
+            index.set_fingerprint(league_key, season, fingerprint)
+    return changes
+
+
+def _csv_rows(frame, columns=None):
+    frame = frame.drop(columns=['league'])
+    if columns is not None:
+        frame = frame.reindex(columns=columns)
+    text = frame.to_csv(index=False, header=False, float_format=FLOAT_FORMAT)
+    return frame.columns.tolist(), list(csv.reader(io.StringIO(text)))
+
+
+def write_top7_csv(seasons, top7_root=TOP7_DIR, csv_path=TOP7_CSV):
+    '''
+    Write the top 7 table to `csv_path`, sorted by player then season. When the file
+    exists, only the rows of `seasons` are read from their partitions and spliced in
+    place of the former ones; the rows of the other seasons are copied as written.
+    '''
+    header = rows = None
+    if seasons is not None and os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            rows = list(reader)
+    if header and 'Player' in header and 'Season' in header:
+        season = header.index('Season')
+        changed = read_players_stats(seasons=list(seasons), root=top7_root)
+        if changed.empty or set(changed.columns) - {'league'} <= set(header):
+            rows = [row for row in rows if row[season] not in seasons]
+            if not changed.empty:
+                rows += _csv_rows(changed, header)[1]
+        else:
+            # a column the file does not have yet: write it again
+            header = None
+    else:
+        header = None
+    if header is None:
+        top7 = read_players_stats(root=top7_root)
+        if top7.empty:
+            if os.path.exists(csv_path):
+                os.remove(csv_path)
+            return
+        header, rows = _csv_rows(top7)
+        season = header.index('Season')
 
+    player = header.index('Player')
+    rows.sort(key=lambda row: (row[player], row[season]))
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
 
-primeira_path = 'scraping_data/results_csv/players_stats_primeiraliga.csv'
-top5_path = 'scraping_data/results_csv/players_stats_top5.csv'
-eredivisie_path = 'scraping_data/results_csv/players_stats_eredivisie.csv'
 
+def build_top7(leagues=TOP7_LEAGUES, root=DATASET_DIR, top7_root=TOP7_DIR, index=None, csv_path=TOP7_CSV, full=False):
+    '''
+    Bring the top 7 table up to date with the league partitions. `full` drops the index
+    and rebuilds every season. When seasons were rewritten, their rows are spliced into
+    `csv_path` (written whole on a full build or when it does not exist yet).
+    Returns the list of seasons rewritten.
+    '''
+    index = index or Top7Index()
+    if full:
+        index.clear()
+        for path in glob.glob(os.path.join(top7_root, f'league={TOP7_KEY}', 'Season=*', 'data.parquet')):
+            os.remove(path)
 
-top5= pd.read_csv(top5_path, low_memory=False)
-primeira=pd.read_csv(primeira_path, low_memory=False)
-eredivisie=pd.read_csv(eredivisie_path, low_memory=False)
+    written = []
+    for season, sources in sorted(changed_partitions(index, leagues, root).items()):
+        changes = merge_season(index, season, sources, leagues, root, top7_root)
+        # the index is committed after the partition is written, so a crash only redoes this season
+        index.commit()
+        if changes:
+            print(f'{season}: {changes} rows merged')
+            written.append(season)
 
-# Delete duplicated columns
-primeira_common = primeira_common.loc[:, ~primeira_common.columns.duplicated()]
-eredivisie_common = eredivisie_common.loc[:, ~eredivisie_common.columns.duplicated()]
-top5_common = top5_common.loc[:, ~top5_common.columns.duplicated()]
+    if written and csv_path:
+        write_top7_csv(None if full else set(written), top7_root, csv_path)
+    return written
 
-# union of the 3 dataframes into top7 dataframe
-top7= pd.concat([primeira_common, top5_common], ignore_index=True)
-top7= pd.concat([eredivisie_common, top7], ignore_index=True)
 
-# Deleting the duplicated (player, saison) and sorting by players
-top7 = top7.drop_duplicates(subset = ['Player', 'Season'])
-top7 = top7.sort_values(by = 'Player')
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help='rebuild the whole table')
+    args = parser.parse_args()
+    written = build_top7(full=args.full)
+    print(f'{len(written)} seasons rewritten')
 
-# save into a csv
-top7.to_csv('scraping_data/results_csv/players_stats_top7.csv', index=False)
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+'''
+Append-only archive of every page fetched, from the network or the response cache, so
+that datasets can be rebuilt from the HTML (see reparse.py) without crawling again.
+
+The layout follows WARC: segment files made of one gzip member per record (a header
+block, then the page body), so a record is read back by seeking to its offset, and an
+SQLite index of the records by URL and fetch time. Segments are only ever appended to;
+a page fetched again with the same body gets an index row pointing to the stored copy.
+'''
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import hashlib
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+ARCHIVE_DIR = 'scraping_data/archive'
+SEGMENT_BYTES = 1024 ** 3  # a new segment file is started above this size
+
+
+class PageArchive:
+    '''WARC-like page archive: gzip segments plus an index.sqlite of (url, fetched_at) -> record.'''
+
+    def __init__(self, directory=ARCHIVE_DIR, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), timeout=60, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS records (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                status INTEGER NOT NULL,
+                content_type TEXT,
+                digest TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )'''
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS records_url ON records (url, fetched_at)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS records_digest ON records (digest)')
+        self.db.commit()
+
+    def _segment(self):
+        '''Name of the segment to append to, starting a new one when the last is full.'''
+        segments = sorted(name for name in os.listdir(self.directory) if name.endswith('.warc.gz'))
+        if segments and os.path.getsize(os.path.join(self.directory, segments[-1])) < self.segment_bytes:
+            return segments[-1]
+        return f'pages-{len(segments):05d}.warc.gz'
+
+    def append(self, url, body, status=200, content_type=None, fetched_at=None):
+        '''Archive a page body (bytes). Returns its sha256 digest.'''
+        fetched_at = fetched_at or time.time()
+        digest = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            stored = self.db.execute(
+                'SELECT segment, offset, length FROM records WHERE digest = ? LIMIT 1', (digest,)
+            ).fetchone()
+            if stored is None:
+                segment = self._segment()
+                header = (
+                    'WARC/1.0\r\n'
+                    'WARC-Type: response\r\n'
+                    f'WARC-Target-URI: {url}\r\n'
+                    f"WARC-Date: {datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+                    f'WARC-Payload-Digest: sha256:{digest}\r\n'
+                    f'HTTP-Status: {status}\r\n'
+                    f"Content-Type: {content_type or 'text/html'}\r\n"
+                    f'Content-Length: {len(body)}\r\n'
+                    '\r\n'
+                ).encode('utf-8')
+                record = gzip.compress(header + body + b'\r\n\r\n', compresslevel=6)
+                path = os.path.join(self.directory, segment)
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(record)
+                stored = (segment, offset, len(record))
+            self.db.execute(
+                'INSERT INTO records (url, fetched_at, status, content_type, digest, segment, offset, length) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, fetched_at, status, content_type, digest, *stored),
+            )
+            self.db.commit()
+        return digest
+
+    def store(self, url, response):
+        '''Archive a requests response fetched from the network (200 only).'''
+        if response is not None and response.status_code == 200:
+            self.append(url, response.content, response.status_code, response.headers.get('Content-Type'))
+
+    def keep(self, url, response):
+        '''Archive a response served by the response cache, unless the latest copy of the URL has the same body.'''
+        if response is None or response.status_code != 200:
+            return
+        digest = hashlib.sha256(response.content).hexdigest()
+        with self.lock:
+            latest = self.db.execute(
+                'SELECT digest FROM records WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)
+            ).fetchone()
+        if latest is None or latest[0] != digest:
+            self.append(url, response.content, response.status_code, response.headers.get('Content-Type'))
+
+    def locate(self, urls=None):
+        '''{url: (segment, offset, length)} of the latest record of each URL (all URLs by default).'''
+        query = (
+            'SELECT url, segment, offset, length FROM records r WHERE fetched_at = '
+            '(SELECT MAX(fetched_at) FROM records WHERE url = r.url)'
+        )
+        located = {url: (segment, offset, length) for url, segment, offset, length in self.db.execute(query)}
+        if urls is None:
+            return located
+        return {url: located[url] for url in urls if url in located}
+
+    def latest(self, url):
+        '''Body (text) of the latest archived copy of a URL, or None.'''
+        location = self.locate([url]).get(url)
+        return read_record(self.directory, *location) if location else None
+
+    def history(self, url):
+        '''(fetched_at, digest) of every archived fetch of a URL, oldest first.'''
+        return self.db.execute(
+            'SELECT fetched_at, digest FROM records WHERE url = ? ORDER BY fetched_at', (url,)
+        ).fetchall()
+
+    def stats(self):
+        records, urls = self.db.execute('SELECT COUNT(*), COUNT(DISTINCT url) FROM records').fetchone()
+        size = sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if name.endswith('.warc.gz')
+        )
+        return {'records': records, 'urls': urls, 'bytes': size}
+
+    def close(self):
+        self.db.close()
+
+
+def read_record(directory, segment, offset, length):
+    '''Body of the record at `offset` of a segment, as text. Usable from any process.'''
+    with open(os.path.join(directory, segment), 'rb') as f:
+        f.seek(offset)
+        record = zlib.decompress(f.read(length), wbits=31)
+    header, _, body = record.partition(b'\r\n\r\n')
+    return body[:-4].decode('utf-8', errors='replace')
+
+
+_archive = None
+_archive_enabled = True
+
+def get_archive():
+    '''Return the process-wide page archive, or None when archiving is disabled.'''
+    global _archive
+    if not _archive_enabled:
+        return None
+    if _archive is None:
+        _archive = PageArchive()
+    return _archive
+
+
+def set_archive(archive):
+    '''Replace the process-wide page archive; pass None to disable archiving.'''
+    global _archive, _archive_enabled
+    _archive = archive
+    _archive_enabled = archive is not None
+
+
+@contextmanager
+def archiving(archive):
+    '''Use `archive` (None disables archiving) within a with block, then restore the previous one.'''
+    global _archive, _archive_enabled
+    previous = _archive, _archive_enabled
+    set_archive(archive)
+    try:
+        yield archive
+    finally:
+        _archive, _archive_enabled = previous
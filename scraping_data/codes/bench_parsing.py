@@ -0,0 +1,104 @@
+'''
+Micro-benchmark of player page parsing: the previous BeautifulSoup + pd.read_html path
+against the table-targeted parser of parsing.py.
+
+Usage (from the repository root):
+    python -m scraping_data.codes.bench_parsing [saved_pages_dir] [--repeat N]
+
+Without a directory, synthetic FBref-like pages are used.
+'''
+from bs4 import BeautifulSoup
+import pandas as pd
+import argparse
+import glob
+import io
+import os
+import time
+
+from scraping_data.codes.FBref_engine import rename_columns_and_flatten
+from scraping_data.codes.parsing import find_first_table, table_to_frame
+from scraping_data.codes.synthetic_pages import player_page
+
+
+TABLE_IDS = ["stats_standard_expanded", "stats_standard_dom_lg"]
+
+
+def parse_with_soup(html):
+    '''Previous path: full BeautifulSoup tree, str() of the table, then pd.read_html.'''
+    soup = BeautifulSoup(html, 'html.parser')
+    stats_table = soup.find("table", id=TABLE_IDS[0])
+    if stats_table is None:
+        stats_table = soup.find("table", id=TABLE_IDS[1])
+    if stats_table is None:
+        return pd.DataFrame()
+    return rename_columns_and_flatten(pd.read_html(io.StringIO(str(stats_table)), header=[0, 1])[0])
+
+
+def parse_targeted(html):
+    '''New path: only the target table is parsed and converted straight into columns.'''
+    table = find_first_table(html, TABLE_IDS)
+    return pd.DataFrame() if table is None else table_to_frame(table)
+
+
+def load_pages(directory):
+    if directory is None:
+        return [player_page(seed=seed) for seed in range(20)]
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.htm*'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def time_parser(parser, pages, repeat):
+    '''Best-of-`repeat` mean parse time per page, in milliseconds.'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            parser(html)
+        best = min(best, (time.perf_counter() - start) / len(pages))
+    return best * 1000
+
+
+def _normalised(frame):
+    frame = frame[frame['Season'].astype(str).str.match(r'\d{4}-\d{4}$')].reset_index(drop=True)
+    return [[_as_number(value) for value in row] for row in frame.values.tolist()]
+
+
+def _as_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return value
+    return None if value != value else value
+
+
+def same_values(html):
+    '''True when both parsers give the same columns and season rows.'''
+    before = parse_with_soup(html)
+    after = parse_targeted(html)
+    return list(before.columns) == list(after.columns) and _normalised(before) == _normalised(after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', help='directory of saved FBref player pages (*.html)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.directory)
+    if not pages:
+        raise SystemExit(f'No *.html page in {args.directory}')
+    size = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f'{len(pages)} pages, {size:.0f} KiB on average')
+
+    before = time_parser(parse_with_soup, pages, args.repeat)
+    after = time_parser(parse_targeted, pages, args.repeat)
+    print(f'BeautifulSoup + read_html : {before:8.2f} ms/page')
+    print(f'table-targeted lxml       : {after:8.2f} ms/page  ({before / after:.1f}x faster)')
+    print(f'same values on every page : {all(same_values(html) for html in pages)}')
+
+
+if __name__ == '__main__':
+    main()
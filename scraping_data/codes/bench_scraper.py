@@ -0,0 +1,131 @@
+'''
+End-to-end benchmark of the scraper against a synthetic league served locally, with
+no network: league page, club pages and player pages of `--clubs` clubs.
+
+Usage (from the repository root):
+    python -m scraping_data.codes.bench_scraper [--clubs 100] [--players 25] [--latency 0.05]
+        [--throttle 0.0] [--malformed 0.0] [--rpm 0] [--concurrency 8]
+
+Reports pages/s of the whole run, parse ms/page of a player page and the peak RSS
+of the scraper process and of its parsing processes. The run happens in a temporary
+directory, so the checkpoint store, player index and dataset of the repository are
+not touched.
+'''
+from contextlib import redirect_stdout
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from scraping_data.codes import FBref_engine
+from scraping_data.codes.fetching import host_limits
+from scraping_data.codes.pipeline import process_pool
+from scraping_data.codes.replay import Faults, ReplayServer, replaying
+from scraping_data.codes.synthetic_pages import SyntheticLeague
+
+
+BENCH_LEAGUE = 'eredivisie'
+BENCH_SEASON = '2023-2024'
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def player_pages(site, n_pages=50):
+    '''(url, html) of the first player pages of the site.'''
+    urls = []
+    for club_id, _ in site.clubs():
+        for player_id, name in site.players(club_id):
+            urls.append(f"https://fbref.com/en/players/{player_id}/all_comps/{name.replace(' ', '-')}-Stats---All-Competitions")
+    return [(url, site.page(url)) for url in urls[:n_pages]]
+
+
+def _parse_pages(pages):
+    for url, html in pages:
+        FBref_engine.parse_player_page(html, url)
+    return peak_rss_mib()
+
+
+def parser_peak_rss_mib(site, n_pages=50):
+    '''
+    Peak RSS of a parsing process after parsing the first player pages of the site.
+    The pools start their workers from a forkserver, so they are not children of
+    this process and RUSAGE_CHILDREN does not see them.
+    '''
+    with process_pool(1) as pool:
+        return pool.submit(_parse_pages, player_pages(site, n_pages)).result()
+
+
+def parse_ms_per_page(site, n_pages=50):
+    '''Mean time of parse_player_page over the first player pages of the site, in milliseconds.'''
+    pages = player_pages(site, n_pages)
+    start = time.perf_counter()
+    for url, html in pages:
+        FBref_engine.parse_player_page(html, url)
+    return (time.perf_counter() - start) / len(pages) * 1000
+
+
+def run(clubs=100, players=25, faults=None, requests_per_minute=0, concurrency=8, verbose=False):
+    '''Scrape the synthetic league once through the stand-in server. Returns a dict of measures.'''
+    league = FBref_engine.LEAGUES[BENCH_LEAGUE]
+    site = SyntheticLeague(league, BENCH_SEASON, n_clubs=clubs, players_per_club=players)
+    results = {'parse_ms_per_page': parse_ms_per_page(site)}
+    cwd = os.getcwd()
+    # 0: no politeness limit, the stand-in is the only bottleneck; the limits of
+    # fbref.com are restored afterwards, for whatever runs next in this process
+    with tempfile.TemporaryDirectory() as directory, ReplayServer(site, faults) as server, \
+            host_limits('fbref.com', requests_per_minute or 10 ** 9, concurrency):
+        os.chdir(directory)
+        try:
+            with replaying(server), open(os.devnull, 'w') as devnull, redirect_stdout(sys.stdout if verbose else devnull):
+                start = time.perf_counter()
+                rows = FBref_engine.main(league, BENCH_SEASON)
+                elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+        served = server.stats()
+        results['peak_rss_mib'] = peak_rss_mib()
+    results['peak_rss_parsers_mib'] = parser_peak_rss_mib(site)
+
+    results.update({
+        'pages_expected': site.n_pages(),
+        'requests': served['requests'],
+        'pages_served': served['pages'],
+        'throttled': served['throttled'],
+        'rows': len(rows),
+        'seconds': elapsed,
+        'pages_per_second': served['pages'] / elapsed,
+        'megabytes': served['bytes'] / 2 ** 20,
+    })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clubs', type=int, default=100)
+    parser.add_argument('--players', type=int, default=25, help='players per club')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--throttle', type=float, default=0.0, help='share of URLs answered 429 once')
+    parser.add_argument('--malformed', type=float, default=0.0, help='share of pages with a truncated table')
+    parser.add_argument('--rpm', type=int, default=0, help='requests per minute to fbref.com, 0 for no limit')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent requests to fbref.com')
+    parser.add_argument('--verbose', action='store_true', help='keep the scraper output')
+    args = parser.parse_args()
+
+    faults = Faults(latency=args.latency, throttle=args.throttle, malformed=args.malformed)
+    results = run(args.clubs, args.players, faults, args.rpm, args.concurrency, args.verbose)
+    print(f"{results['pages_served']}/{results['pages_expected']} pages served "
+          f"({results['requests']} requests, {results['throttled']} throttled, {results['megabytes']:.0f} MiB), "
+          f"{results['rows']} rows")
+    print(f"throughput        : {results['pages_per_second']:8.1f} pages/s ({results['seconds']:.1f} s)")
+    print(f"parse             : {results['parse_ms_per_page']:8.2f} ms/page")
+    print(f"peak RSS scraper  : {results['peak_rss_mib']:8.0f} MiB")
+    print(f"peak RSS parsers  : {results['peak_rss_parsers_mib']:8.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
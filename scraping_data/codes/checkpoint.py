@@ -0,0 +1,112 @@
+import pandas as pd
+import sqlite3
+import time
+
+
+CHECKPOINT_DB = 'scraping_checkpoint.sqlite'
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ScrapeCheckpoint:
+    '''
+    Scrape progress of every league and season, one row per (league, season, url).
+
+    Status changes are written inside an open transaction and only made durable by
+    `commit`, which the scraper calls right after flushing the matching rows to disk:
+    a crash never records as done a page whose rows were lost. The database runs in
+    WAL mode so several workers can share it.
+    '''
+
+    def __init__(self, path=CHECKPOINT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS urls (
+                league TEXT NOT NULL,
+                season TEXT NOT NULL,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                parent TEXT,
+                position INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                fetched_at REAL,
+                row_count INTEGER,
+                error TEXT,
+                PRIMARY KEY (league, season, url)
+            )'''
+        )
+        self.db.commit()
+
+    def add(self, league, season, urls, kind, parent=None):
+        '''Register URLs as pending (URLs already known keep their status).'''
+        self.db.executemany(
+            'INSERT OR IGNORE INTO urls (league, season, url, kind, parent, position) VALUES (?, ?, ?, ?, ?, ?)',
+            [(league, season, url, kind, parent, position) for position, url in enumerate(urls)],
+        )
+        self.db.commit()
+
+    def todo(self, league, season, urls, max_age=None):
+        '''
+        The URLs, in the given order, that are not done yet, or that were done more
+        than `max_age` seconds ago when it is given.
+        '''
+        query = 'SELECT url FROM urls WHERE league = ? AND season = ? AND status = ?'
+        params = [league, season, DONE]
+        if max_age is not None:
+            query += ' AND fetched_at >= ?'
+            params.append(time.time() - max_age)
+        done = {url for (url,) in self.db.execute(query, params)}
+        return [url for url in urls if url not in done]
+
+    def urls(self, league, season, kind, parent=None):
+        '''The URLs of a kind recorded for a league and season (only those found on `parent` when given), in order.'''
+        query = 'SELECT url FROM urls WHERE league = ? AND season = ? AND kind = ?'
+        params = [league, season, kind]
+        if parent is not None:
+            query += ' AND parent = ?'
+            params.append(parent)
+        return [url for (url,) in self.db.execute(query + ' ORDER BY position, rowid', params)]
+
+    def done_urls(self, kind, leagues=None):
+        '''Distinct (league, url) pairs of the given kind that are done, in scraping order.'''
+        query = 'SELECT league, url, MIN(rowid) FROM urls WHERE kind = ? AND status = ?'
+        params = [kind, DONE]
+        if leagues is not None:
+            query += f" AND league IN ({', '.join('?' * len(leagues))})"
+            params += list(leagues)
+        query += ' GROUP BY league, url ORDER BY MIN(rowid)'
+        return [(league, url) for league, url, _ in self.db.execute(query, params)]
+
+    def mark(self, league, season, url, status, row_count=None, error=None):
+        '''Record the outcome of a URL; durable at the next commit.'''
+        self.db.execute(
+            'UPDATE urls SET status = ?, fetched_at = ?, row_count = ?, error = ? WHERE league = ? AND season = ? AND url = ?',
+            (status, time.time(), row_count, error, league, season, url),
+        )
+
+    def commit(self):
+        self.db.commit()
+
+    def summary(self, league=None, season=None):
+        '''Number of URLs and rows per league, season, kind and status.'''
+        query = 'SELECT league, season, kind, status, COUNT(*) AS urls, SUM(row_count) AS rows FROM urls'
+        conditions, params = [], []
+        if league is not None:
+            conditions.append('league = ?')
+            params.append(league)
+        if season is not None:
+            conditions.append('season = ?')
+            params.append(season)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' GROUP BY league, season, kind, status ORDER BY league, season, kind, status'
+        return pd.read_sql_query(query, self.db, params=params)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
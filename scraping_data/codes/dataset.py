@@ -0,0 +1,225 @@
+'''
+Scraped player statistics as a Parquet dataset partitioned by league and season:
+
+    scraping_data/results_parquet/players_stats/league=<key>/Season=<season>/data.parquet
+
+Usage (from the repository root), to convert the existing league CSVs, or write them back:
+    python -m scraping_data.codes.dataset convert [league ...]
+    python -m scraping_data.codes.dataset export [league ...]
+'''
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import argparse
+import csv
+import glob
+import os
+
+from scraping_data.codes.schema import COLUMNS, align, apply_dtypes
+from scraping_data.codes.sink import dedupe_columns
+
+
+DATASET_DIR = 'scraping_data/results_parquet/players_stats'
+# Rates are stored as float32: seven significant digits write them back as scraped (0.1, not 0.10000000149)
+FLOAT_FORMAT = '%.7g'
+PARTITIONING = ds.partitioning(pa.schema([('league', pa.string()), ('Season', pa.string())]), flavor='hive')
+
+
+def drop_duplicate_rows(all_players_stats):
+    '''
+    Keep one row per (player, season), the first one, as the former scrapers did.
+    Rows are keyed by Player ID; rows of older files without it fall back to the
+    player name.
+    '''
+    if 'Player ID' not in all_players_stats.columns:
+        return all_players_stats.drop_duplicates(subset=['Player', 'Season'], keep='first')
+
+    # rows keep their order: duplicates are masked, not regrouped
+    has_id = all_players_stats['Player ID'].notna().to_numpy()
+    duplicated = np.zeros(len(all_players_stats), dtype=bool)
+    duplicated[has_id] = all_players_stats[has_id].duplicated(subset=['Player ID', 'Season'], keep='first').to_numpy()
+    duplicated[~has_id] = all_players_stats[~has_id].duplicated(subset=['Player', 'Season'], keep='first').to_numpy()
+    # a legacy row is dropped once the player has a row with an id for the season
+    rescraped = ~has_id & pd.MultiIndex.from_frame(all_players_stats[['Player', 'Season']]).isin(
+        pd.MultiIndex.from_frame(all_players_stats.loc[has_id, ['Player', 'Season']])
+    )
+    return all_players_stats[~(duplicated | rescraped)].reset_index(drop=True)
+
+
+def partition_path(league_key, season, root=DATASET_DIR):
+    return os.path.join(root, f'league={league_key}', f'Season={season}', 'data.parquet')
+
+
+def normalise(frame):
+    '''Rows aligned on the canonical schema (see schema.py), whatever file or page they come from.'''
+    return align(frame)
+
+
+def _storable(frame):
+    # categories are stored as plain (dictionary-encoded) strings so that every
+    # partition file has the same Parquet schema; read_players_stats restores them
+    frame = frame.copy()
+    for col in frame.columns[frame.dtypes == 'category']:
+        frame[col] = frame[col].astype('string')
+    return frame
+
+
+def read_partition(league_key, season, root=DATASET_DIR):
+    path = partition_path(league_key, season, root)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    frame = pd.read_parquet(path)
+    frame['Season'] = season
+    return normalise(frame)
+
+
+def write_partition(league_key, season, frame, root=DATASET_DIR):
+    '''Replace one league/season partition with `frame`.'''
+    path = partition_path(league_key, season, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = _storable(normalise(frame).drop(columns=['Season']))
+    frame.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def _replaced(existing, rows):
+    '''Mask of the stored rows that `rows` hold again: same Player ID and season, else same name and season.'''
+    def keys(frame, columns):
+        return pd.MultiIndex.from_frame(frame[columns].astype(object))
+
+    replaced = keys(existing, ['Player', 'Season']).isin(keys(rows, ['Player', 'Season']))
+    if 'Player ID' in existing.columns and 'Player ID' in rows.columns:
+        has_id = existing['Player ID'].notna().to_numpy()
+        rows_with_id = rows[rows['Player ID'].notna()]
+        by_id = keys(existing, ['Player ID', 'Season']).isin(keys(rows_with_id, ['Player ID', 'Season']))
+        # rows with an id are matched on it; legacy rows, without one, on the name
+        replaced = np.where(has_id, by_id, replaced)
+    return np.asarray(replaced, dtype=bool)
+
+
+def merge_partitions(league_key, scraped, root=DATASET_DIR):
+    '''
+    Merge freshly scraped rows into the league's partitions. Only the seasons present in
+    `scraped` are read and rewritten; the scraped rows replace the stored rows of the
+    players scraped again, the other stored rows keep their order and the new ones come
+    after them. Returns the list of seasons written.
+    '''
+    scraped = scraped[scraped['Season'].notna()]
+    written = []
+    for season, rows in scraped.groupby('Season', sort=True):
+        existing = read_partition(league_key, season, root)
+        rows = normalise(rows)
+        if not existing.empty:
+            existing = existing[~_replaced(existing, rows)]
+            rows = pd.concat([existing, rows], ignore_index=True)
+        write_partition(league_key, season, drop_duplicate_rows(rows), root)
+        written.append(season)
+    return written
+
+
+def _unified_schema(files):
+    '''
+    Schema covering every file. Files written with the same schema version agree;
+    a column whose type still differs between files is read as string.
+    '''
+    fields = {}
+    for path in files:
+        for field in pq.read_schema(path):
+            if field.name not in fields:
+                fields[field.name] = field.type
+            elif fields[field.name] != field.type:
+                fields[field.name] = pa.string()
+    fields.update({'league': pa.string(), 'Season': pa.string()})
+    return pa.schema(list(fields.items()))
+
+
+def _expand_columns(columns, names):
+    '''Expand "Per 90 Minutes : *" style patterns against the available column names.'''
+    selected = []
+    for col in columns:
+        matches = [name for name in names if name.startswith(col[:-1])] if col.endswith('*') else [col]
+        selected += [name for name in matches if name not in selected]
+    return selected
+
+
+def read_players_stats(columns=None, leagues=None, seasons=None, root=DATASET_DIR):
+    '''
+    Read the dataset, loading only the requested columns and partitions.
+
+    columns: column names, or prefixes ending with "*" such as "Per 90 Minutes : *"
+    leagues, seasons: partition filters (league keys, seasons like "2023-2024")
+    '''
+    files = glob.glob(os.path.join(root, 'league=*', 'Season=*', '*.parquet'))
+    if leagues is not None:
+        files = [f for f in files if os.path.basename(os.path.dirname(os.path.dirname(f)))[len('league='):] in leagues]
+    if seasons is not None:
+        files = [f for f in files if os.path.basename(os.path.dirname(f))[len('Season='):] in seasons]
+    if not files:
+        return pd.DataFrame()
+
+    schema = _unified_schema(files)
+    dataset = ds.dataset(files, schema=schema, format='parquet', partitioning=PARTITIONING, partition_base_dir=root)
+    if columns is not None:
+        columns = _expand_columns(columns, schema.names)
+    return apply_dtypes(dataset.to_table(columns=columns).to_pandas())
+
+
+def convert_csv(league, root=DATASET_DIR):
+    '''Load a league CSV written by the former scrapers into the dataset.'''
+    frame = pd.read_csv(league['output_path'], low_memory=False)
+    return merge_partitions(league['key'], frame, root)
+
+
+def export_csv(league, path=None, root=DATASET_DIR):
+    '''
+    Write the rows of a league back to a single CSV file, for tools that still expect one.
+    An existing file keeps its layout: its columns in their order (the unnamed index
+    column of the former scrapers included) and its rows in their order, new rows after
+    them. Rates are written with FLOAT_FORMAT, the precision they are stored with.
+    '''
+    path = path or league['output_path']
+    frame = read_players_stats(leagues=[league['key']], root=root).drop(columns=['league'])
+    # partitions come in no particular order; the rows of each keep theirs
+    frame = frame.sort_values('Season', kind='stable')
+    header = None
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), None)
+    if header is None:
+        columns = [col for col in COLUMNS if col in frame.columns]
+        frame = frame[columns + [col for col in frame.columns if col not in COLUMNS]]
+        frame.to_csv(path, index=False, float_format=FLOAT_FORMAT)
+        return
+
+    previous = pd.read_csv(path, usecols=['Player', 'Season'], dtype=str)
+    order = pd.MultiIndex.from_frame(previous.astype(object))
+    order = order[~order.duplicated()]
+    position = order.get_indexer(pd.MultiIndex.from_frame(frame[['Player', 'Season']].astype(object)))
+    position = np.where(position < 0, len(order) + np.arange(len(frame)), position)
+    frame = frame.iloc[np.argsort(position, kind='stable')].reset_index(drop=True)
+    # the header as written, repeated names included; read back, they are the columns MP.1, Matches.1...
+    index = header[0] == ''
+    names = header[1:] if index else header
+    frame = frame.reindex(columns=dedupe_columns(names))
+    frame.to_csv(path, index=index, header=names, float_format=FLOAT_FORMAT)
+
+
+def main():
+    from scraping_data.codes.FBref_engine import LEAGUES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['convert', 'export'])
+    parser.add_argument('leagues', nargs='*', default=list(LEAGUES))
+    args = parser.parse_args()
+    for key in args.leagues:
+        if args.command == 'export':
+            export_csv(LEAGUES[key])
+        elif os.path.exists(LEAGUES[key]['output_path']):
+            seasons = convert_csv(LEAGUES[key])
+            print(f'{key}: {len(seasons)} seasons written')
+
+
+if __name__ == '__main__':
+    main()
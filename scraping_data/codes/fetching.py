@@ -0,0 +1,356 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import random
+import threading
+import time
+
+from scraping_data.codes.http_cache import get_cache
+from scraping_data.codes.archive import get_archive
+from scraping_data.codes.metrics import TimedHTTPAdapter, get_metrics, reset_phases, connection_phases
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+# Headers sent to a host instead of HEADERS. Wikimedia asks bots for a User-Agent naming
+# the tool and a way to reach its authors, and blocks generic browser ones
+HOST_HEADERS = {
+    'fr.wikipedia.org': {
+        'User-Agent': f'ModelingFootballValue/1.0 (https://github.com/romandb21/ModelingFootballValue) python-requests/{requests.__version__}'
+    },
+}
+
+REQUEST_TIMEOUT = 30
+
+# Politeness budget per host. The old fixed 3-4 s sleep was about 16 requests per minute.
+HOST_LIMITS = {
+    'fbref.com': {'requests_per_minute': 16, 'max_concurrency': 4},
+    # Wikipedia tolerates more than FBref, but wants bots to stay well under its limits:
+    # few requests in flight, and the stadium API queries are batched (see using_data/mapping.py)
+    'fr.wikipedia.org': {'requests_per_minute': 200, 'max_concurrency': 2},
+}
+DEFAULT_LIMITS = {'requests_per_minute': 30, 'max_concurrency': 4}
+
+# Responses worth asking again: throttling and server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+# Exponential backoff with full jitter: a random delay in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)].
+# The cap only bounds our own backoff: a Retry-After asked by the server is always honoured in full
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+# Consecutive failures (429 excepted: it opens the circuit at once) before a host's circuit opens
+BREAKER_THRESHOLD = 3
+
+
+_session = None
+
+def get_session():
+    '''Return the HTTP session shared by every league and season (keep-alive connection pool).'''
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update(HEADERS)
+        adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=16)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+
+
+class TokenBucket:
+    '''
+    Thread-safe token bucket: tokens are refilled continuously at `requests_per_minute`
+    and at most `burst` of them can be stored.
+    '''
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''Block until a token is available, then take it.'''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after(response):
+    '''Seconds asked by a Retry-After header (delay or HTTP date), or None.'''
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt, response=None):
+    '''Seconds to wait before retry number `attempt` (0-based): the full Retry-After when given, else backoff with jitter.'''
+    asked = retry_after(response)
+    if asked is not None:
+        return asked
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    '''
+    Per-host circuit breaker. A 429, or BREAKER_THRESHOLD failures in a row, opens the
+    circuit: every request to the host, new ones included, waits until it closes,
+    instead of each worker retrying on its own. Each reopening without a success in
+    between doubles the pause.
+    '''
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        '''Block while the circuit is open.'''
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.trips = 0
+
+    def failure(self, delay, throttled=False):
+        '''Record a failed attempt; returns True when the circuit is (now) open.'''
+        with self.lock:
+            now = time.monotonic()
+            if self.open_until > now:
+                return True
+            self.failures += 1
+            if not throttled and self.failures < BREAKER_THRESHOLD:
+                return False
+            pause = max(delay, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.trips))
+            self.trips += 1
+            self.failures = 0
+            self.open_until = now + pause
+        get_metrics().increment('circuit_open_total', self.host)
+        print(f"{self.host}: pausing requests for {pause:.0f} s ({'throttled' if throttled else 'repeated failures'})")
+        return True
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+def host_of(url):
+    '''Return the host of a URL without a leading "www.".'''
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def host_headers(url):
+    '''Headers of the requests to the host of a URL, over those of the session.'''
+    return HOST_HEADERS.get(host_of(url), {})
+
+
+def configure_host(host, requests_per_minute, max_concurrency=4):
+    '''Set (or change) the rate limit and concurrency of a host.'''
+    HOST_LIMITS[host] = {'requests_per_minute': requests_per_minute, 'max_concurrency': max_concurrency}
+    with _host_limiters_lock:
+        _host_limiters.pop(host, None)
+
+
+@contextmanager
+def host_limits(host, requests_per_minute, max_concurrency=4):
+    '''Use other limits for a host within a with block, then restore the previous ones.'''
+    previous = HOST_LIMITS.get(host)
+    configure_host(host, requests_per_minute, max_concurrency)
+    try:
+        yield
+    finally:
+        if previous is None:
+            HOST_LIMITS.pop(host, None)
+            with _host_limiters_lock:
+                _host_limiters.pop(host, None)
+        else:
+            configure_host(host, previous['requests_per_minute'], previous['max_concurrency'])
+
+
+def get_host_limiter(url):
+    '''Return the (token bucket, concurrency semaphore, circuit breaker) of the URL's host.'''
+    host = host_of(url)
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            limits = HOST_LIMITS.get(host, DEFAULT_LIMITS)
+            _host_limiters[host] = (
+                TokenBucket(limits['requests_per_minute']),
+                threading.BoundedSemaphore(limits['max_concurrency']),
+                CircuitBreaker(host),
+            )
+        return _host_limiters[host]
+
+
+def _wait_turn(url):
+    '''Take a concurrency slot and a rate-limit token of the URL's host, once its circuit is closed.'''
+    bucket, slots, breaker = get_host_limiter(url)
+    slots.acquire()
+    breaker.wait()
+    bucket.acquire()
+    return slots
+
+
+
+def _record(url, response, start):
+    '''Record the latency phases, size and status of a response in the metrics.'''
+    metrics = get_metrics()
+    host = host_of(url)
+    dns, connect = connection_phases()
+    if dns is not None:
+        metrics.observe('request_dns_seconds', dns, host)
+    if connect is not None:
+        metrics.observe('request_connect_seconds', connect, host)
+    # elapsed runs from sending to the response headers, the lookup and connection of a new connection included
+    ttfb = response.elapsed.total_seconds() - (dns or 0) - (connect or 0)
+    metrics.observe('request_ttfb_seconds', max(ttfb, 0.0), host)
+    metrics.observe('request_seconds', time.perf_counter() - start, host)
+    metrics.observe('response_bytes', len(response.content), host)
+    metrics.increment('responses_total', host, status=response.status_code)
+
+
+def _send(session, url):
+    '''
+    One attempt: GET through the response cache, recorded in the metrics and kept in the
+    page archive. None on a network error.
+    '''
+    metrics = get_metrics()
+    reset_phases()
+    start = time.perf_counter()
+    try:
+        cache = get_cache()
+        archive = get_archive()
+        if cache is None:
+            response = session.get(url, headers=host_headers(url), timeout=REQUEST_TIMEOUT)
+            _record(url, response, start)
+            if archive is not None:
+                archive.store(url, response)
+            return response
+        headers = {**host_headers(url), **cache.conditional_headers(url)}
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        _record(url, response, start)
+        if archive is not None:
+            archive.store(url, response)
+        if response.status_code != 304:
+            return cache.store(url, response)
+        metrics.increment('cache_revalidated_total', host_of(url))
+        response = cache.store(url, response)
+        if archive is not None:
+            archive.keep(url, response)
+        return response
+    except requests.RequestException as e:
+        metrics.increment('request_errors_total', host_of(url), error=type(e).__name__)
+        print(f"Error fetching {url}: {e}")
+        return None
+
+
+def _get(session, url, slots):
+    '''
+    GET a URL whose first slot and token are already taken, retrying network errors
+    and RETRY_STATUSES responses up to MAX_RETRIES times. Returns the last response.
+    '''
+    bucket, _, breaker = get_host_limiter(url)
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                get_metrics().increment('retries_total', host_of(url))
+                breaker.wait()
+                bucket.acquire()
+            response = _send(session, url)
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                breaker.success()
+                return response
+            if attempt == MAX_RETRIES:
+                return response
+            delay = retry_delay(attempt, response)
+            throttled = response is not None and response.status_code == 429
+            # an open circuit makes every request of the host wait; otherwise only this one does
+            if not breaker.failure(delay, throttled):
+                time.sleep(delay)
+    finally:
+        slots.release()
+
+
+def _cache_hit(url):
+    cache = get_cache()
+    hit = cache.get(url) if cache is not None else None
+    if cache is not None and hit is None:
+        # counted once per URL, however many attempts its request takes
+        get_metrics().increment('cache_misses_total', host_of(url))
+    if hit is not None:
+        get_metrics().increment('cache_hits_total', host_of(url))
+        # pages served by the cache are archived too: reparse.py reads every page from the archive
+        archive = get_archive()
+        if archive is not None:
+            archive.keep(url, hit)
+    return hit
+
+
+def fetch(url, session=None):
+    '''
+    Fetch one URL, from the response cache when fresh, otherwise within its host's
+    rate limit, retrying throttled and failed requests. Returns the response (whose
+    status may still be an error once the retries are spent), or None on a network error.
+    '''
+    hit = _cache_hit(url)
+    if hit is not None:
+        return hit
+    slots = _wait_turn(url)
+    return _get(session or get_session(), url, slots)
+
+
+def fetch_many(urls, session=None, max_workers=8):
+    '''
+    Fetch URLs concurrently within their hosts' rate limits.
+
+    Requests are sent in the order of `urls` and (url, response) pairs are yielded
+    in that same order, so callers can checkpoint after each one exactly as with
+    a sequential loop. Fresh cache hits use no rate-limit token. Requests are retried
+    as in `fetch`, and a host whose circuit is open stops receiving new requests.
+    response is None on a network error.
+    '''
+    session = session or get_session()
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for url in urls:
+            hit = _cache_hit(url)
+            if hit is not None:
+                future = Future()
+                future.set_result(hit)
+            else:
+                slots = _wait_turn(url)
+                future = pool.submit(_get, session, url, slots)
+            pending.append((url, future))
+            while pending and pending[0][1].done():
+                done_url, future = pending.popleft()
+                yield done_url, future.result()
+        while pending:
+            done_url, future = pending.popleft()
+            yield done_url, future.result()
@@ -0,0 +1,251 @@
+import requests
+from requests.structures import CaseInsensitiveDict
+from contextlib import contextmanager
+from datetime import date
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+
+CACHE_DIR = '.http_cache'
+MAX_CACHE_BYTES = 1024 ** 3  # compressed bodies, least recently used entries are evicted above this
+
+HOUR = 3600
+DAY = 24 * HOUR
+# URLs never cached: the MediaWiki API answers the last revision ids the stadium refresh
+# compares with its store (see using_data/mapping.py), so they must always be current
+UNCACHED_RE = re.compile(r'wikipedia\.org/w/api\.php')
+# Time to live (seconds) by URL pattern, first match wins. None means the entry never expires.
+# Pages of a past season never expire (see ttl_for); these rules apply to everything else.
+CACHE_TTLS = [
+    (r'fbref\.com/.*/players/', DAY),
+    (r'fbref\.com/.*/squads/', DAY),
+    (r'fbref\.com/.*/comps/', DAY),
+    # division listings and the articles crawled again once their revision changed
+    (r'wikipedia\.org', HOUR),
+]
+DEFAULT_TTL = DAY
+
+SEASON_RE = re.compile(r'(\d{4})-(\d{4})')
+
+
+def current_season(today=None):
+    '''Season in progress, e.g. "2024-2025" (a season starts in July).'''
+    today = today or date.today()
+    start = today.year if today.month >= 7 else today.year - 1
+    return f'{start}-{start + 1}'
+
+
+def ttl_for(url):
+    '''Return the time to live of a URL in seconds, None if it never expires, 0 if it is not cached.'''
+    if UNCACHED_RE.search(url):
+        return 0
+    season = SEASON_RE.search(url)
+    if season and season.group(0) < current_season():
+        return None
+    for pattern, ttl in CACHE_TTLS:
+        if re.search(pattern, url):
+            return ttl
+    return DEFAULT_TTL
+
+
+
+def _build_response(url, body, status_code, headers, encoding):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = encoding
+    return response
+
+
+class ResponseCache:
+    '''
+    On-disk HTTP response cache.
+
+    Bodies are zlib-compressed and stored once per content hash under objects/; a SQLite
+    index maps each URL to its body, validators (ETag / Last-Modified) and expiry time.
+    Expired entries are revalidated with a conditional request, and the least recently
+    used entries are evicted once the compressed size goes over `max_bytes`.
+    '''
+
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(path, 'index.sqlite'), check_same_thread=False)
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                encoding TEXT,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )'''
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self.db.commit()
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], digest + '.z')
+
+    def _read(self, url, row):
+        digest, encoding, content_type = row
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        headers = {'Content-Type': content_type} if content_type else {}
+        return _build_response(url, body, 200, headers, encoding)
+
+    def get(self, url):
+        '''Return the cached response of a URL if it is still fresh, else None.'''
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                'SELECT digest, encoding, content_type FROM responses WHERE url = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (url, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE responses SET last_access = ? WHERE url = ?', (now, url))
+            self.db.commit()
+        return self._read(url, row)
+
+    def conditional_headers(self, url):
+        '''Return the If-None-Match / If-Modified-Since headers for revalidating a stale entry.'''
+        with self.lock:
+            row = self.db.execute('SELECT etag, last_modified FROM responses WHERE url = ?', (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def store(self, url, response):
+        '''
+        Record a network response and return the response callers should use:
+        the cached body on a 304, the response itself otherwise.
+        '''
+        now = time.time()
+        ttl = ttl_for(url)
+        if ttl == 0:
+            return response
+        expires_at = None if ttl is None else now + ttl
+
+        if response.status_code == 304:
+            with self.lock:
+                row = self.db.execute('SELECT digest, encoding, content_type FROM responses WHERE url = ?', (url,)).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        'UPDATE responses SET fetched_at = ?, expires_at = ?, last_access = ? WHERE url = ?',
+                        (now, expires_at, now, url),
+                    )
+                    self.db.commit()
+            cached = self._read(url, row) if row else None
+            return cached if cached is not None else response
+
+        if response.status_code != 200:
+            return response
+
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f'{object_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp_path, object_path)
+        size = os.path.getsize(object_path)
+
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, size, response.encoding, response.headers.get('Content-Type'),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, expires_at, now),
+            )
+            self.db.commit()
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+        return response
+
+    def _evict(self):
+        '''Drop least recently used entries until the cache fits in max_bytes (lock held).'''
+        rows = self.db.execute('SELECT url, digest, size FROM responses ORDER BY last_access').fetchall()
+        target = self.max_bytes * 0.9
+        for url, digest, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self.total_bytes -= size
+            still_used = self.db.execute('SELECT 1 FROM responses WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+            if not still_used:
+                try:
+                    os.remove(self._object_path(digest))
+                except OSError:
+                    pass
+        self.db.commit()
+
+
+
+_cache = None
+_cache_enabled = True
+
+def get_cache():
+    '''Return the process-wide response cache, or None when caching is disabled.'''
+    global _cache
+    if not _cache_enabled:
+        return None
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def set_cache(cache):
+    '''Replace the process-wide response cache; pass None to disable caching.'''
+    global _cache, _cache_enabled
+    _cache = cache
+    _cache_enabled = cache is not None
+
+
+@contextmanager
+def caching(cache):
+    '''Use `cache` (None disables caching) within a with block, then restore the previous one.'''
+    global _cache, _cache_enabled
+    previous = _cache, _cache_enabled
+    set_cache(cache)
+    try:
+        yield cache
+    finally:
+        _cache, _cache_enabled = previous
+
+
+def cached_get(url, session=None, timeout=30):
+    '''GET a URL through the response cache, revalidating stale entries.'''
+    from scraping_data.codes.fetching import get_session, host_headers
+    session = session or get_session()
+    cache = get_cache()
+    if cache is None:
+        return session.get(url, headers=host_headers(url), timeout=timeout)
+    hit = cache.get(url)
+    if hit is not None:
+        return hit
+    response = session.get(url, headers={**host_headers(url), **cache.conditional_headers(url)}, timeout=timeout)
+    return cache.store(url, response)
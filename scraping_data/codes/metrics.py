@@ -0,0 +1,274 @@
+'''
+Metrics of the scraper requests: latency phases, response sizes, parse times, rows,
+cache hits and retries, aggregated into histograms per host.
+
+fetching.py and pipeline.py record into the process-wide registry returned by
+get_metrics(); FBref_engine.main and the scheduler write it at the end of a run as a
+Prometheus textfile (for the node_exporter textfile collector) and a JSON summary.
+'''
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+import json
+import os
+import socket
+import threading
+import time
+
+
+METRICS_PROM = 'scraping_metrics.prom'
+METRICS_JSON = 'scraping_metrics.json'
+
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+BYTES_BUCKETS = [2 ** 10, 2 ** 13, 2 ** 15, 2 ** 17, 2 ** 18, 2 ** 19, 2 ** 20, 2 ** 21, 2 ** 22]
+ROWS_BUCKETS = [0, 1, 5, 10, 15, 25, 50, 100]
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'request_dns_seconds': ('DNS resolution time of new connections', SECONDS_BUCKETS),
+    'request_connect_seconds': ('TCP connect (and TLS handshake) time of new connections', SECONDS_BUCKETS),
+    'request_ttfb_seconds': ('Time from sending the request to the response headers, DNS and connect excluded', SECONDS_BUCKETS),
+    'request_seconds': ('Total request time, body included', SECONDS_BUCKETS),
+    'response_bytes': ('Response body size', BYTES_BUCKETS),
+    'parse_seconds': ('Parse time of a page', SECONDS_BUCKETS),
+    'parse_rows': ('Rows produced by a page', ROWS_BUCKETS),
+}
+COUNTERS = {
+    'responses_total': 'Responses received, by HTTP status',
+    'request_errors_total': 'Requests that failed without a response',
+    'cache_hits_total': 'Requests answered by the response cache',
+    'cache_misses_total': 'URLs fetched from the network with the cache enabled, retries not counted',
+    'cache_revalidated_total': 'Stale cache entries confirmed by a 304',
+    'retries_total': 'Requests sent again after a failure',
+    'circuit_open_total': 'Times a host was paused by its circuit breaker',
+}
+
+
+class Histogram:
+    '''Cumulative-bucket histogram with count, sum and max.'''
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        '''Estimate of the q-quantile, interpolated within its bucket.'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    '''Thread-safe registry of histograms and counters, labelled by host.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.histograms = {}
+            self.counters = {}
+
+    def observe(self, name, value, host=''):
+        with self.lock:
+            key = (name, host)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+            self.histograms[key].observe(value)
+
+    def increment(self, name, host='', amount=1, **labels):
+        with self.lock:
+            key = (name, host, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name, host=None):
+        '''Total of a counter, over every host unless one is given.'''
+        with self.lock:
+            return sum(
+                value for (counter_name, counter_host, _), value in self.counters.items()
+                if counter_name == name and (host is None or counter_host == host)
+            )
+
+    def prometheus(self, prefix='fbref_scraper'):
+        '''The registry in the Prometheus text exposition format.'''
+        lines = []
+        with self.lock:
+            for name, help_text in COUNTERS.items():
+                values = [(key, value) for key, value in sorted(self.counters.items()) if key[0] == name]
+                if not values:
+                    continue
+                lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} counter']
+                for (_, host, labels), value in values:
+                    lines.append(f'{prefix}_{name}{_labels(host=host, **dict(labels))} {value}')
+            for name, (help_text, _) in HISTOGRAMS.items():
+                values = [(host, histogram) for (hist_name, host), histogram in sorted(self.histograms.items()) if hist_name == name]
+                if not values:
+                    continue
+                lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} histogram']
+                for host, histogram in values:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f'{prefix}_{name}_bucket{_labels(host=host, le=bound)} {cumulative}')
+                    lines.append(f'{prefix}_{name}_sum{_labels(host=host)} {histogram.sum}')
+                    lines.append(f'{prefix}_{name}_count{_labels(host=host)} {histogram.count}')
+            lines.append(f'{prefix}_run_start_time_seconds {self.started}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        '''JSON-serialisable summary: counters and histogram statistics per host.'''
+        with self.lock:
+            hosts = {}
+            for (name, host, labels), value in sorted(self.counters.items()):
+                counters = hosts.setdefault(host, {'counters': {}, 'histograms': {}})['counters']
+                label = name + ''.join(f'[{key}={label}]' for key, label in labels)
+                counters[label] = value
+            for (name, host), histogram in sorted(self.histograms.items()):
+                hosts.setdefault(host, {'counters': {}, 'histograms': {}})['histograms'][name] = histogram.summary()
+            return {'started': self.started, 'seconds': time.time() - self.started, 'hosts': hosts}
+
+    def write(self, prom_path=METRICS_PROM, json_path=METRICS_JSON):
+        '''Write the Prometheus textfile and the JSON summary, each atomically.'''
+        for path, text in ((prom_path, self.prometheus()), (json_path, json.dumps(self.summary(), indent=2))):
+            if path:
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(path + '.tmp', path)
+
+    def report(self):
+        '''One line per host: requests, statuses, cache hits, retries and latency.'''
+        lines = []
+        for host, data in self.summary()['hosts'].items():
+            counters = data['counters']
+            statuses = ', '.join(f"{key.split('=')[1][:-1]}: {value}" for key, value in counters.items() if key.startswith('responses_total'))
+            total = data['histograms'].get('request_seconds', {})
+            latency = f"p50 {total['p50']:.2f} s, p95 {total['p95']:.2f} s" if total.get('count') else 'no request'
+            lines.append(
+                f"{host or 'all'}: {statuses or 'no response'} | cache hits {counters.get('cache_hits_total', 0)}"
+                f" | retries {counters.get('retries_total', 0)} | {latency}"
+            )
+        return '\n'.join(lines)
+
+
+def _labels(**labels):
+    labels = {key: value for key, value in labels.items() if value != ''}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+_metrics = Metrics()
+
+def get_metrics():
+    '''Return the process-wide metrics registry.'''
+    return _metrics
+
+
+# Connection phases are measured by the connections themselves, in the thread that
+# sends the request; fetching.py reads them back once the response is received.
+_phases = threading.local()
+
+
+def reset_phases():
+    _phases.dns = _phases.connect = None
+
+
+def connection_phases():
+    '''(dns seconds, connect seconds) of the connection opened by the last request of
+    this thread, or (None, None) when a kept-alive connection was reused.'''
+    return getattr(_phases, 'dns', None), getattr(_phases, 'connect', None)
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        # resolve here, with the address family urllib3 allows, to time DNS apart from connect;
+        # the addresses are then tried in turn as create_connection does. TLS still uses the host name
+        dns_host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(dns_host.strip('[]'), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror:
+            # urllib3 resolves again and raises its own NameResolutionError
+            addresses = []
+        _phases.dns = time.perf_counter() - start
+        if not addresses:
+            return super()._new_conn()
+        try:
+            for *_, sockaddr in addresses:
+                self._dns_host = sockaddr[0]
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = dns_host
+
+    def connect(self):
+        # TCP connect, plus the TLS handshake for HTTPS
+        start = time.perf_counter()
+        super().connect()
+        _phases.connect = time.perf_counter() - start - (getattr(_phases, 'dns', None) or 0)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    '''HTTPAdapter whose new connections record their DNS and connect times.'''
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
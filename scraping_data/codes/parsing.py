@@ -0,0 +1,104 @@
+import lxml.html
+import numpy as np
+import pandas as pd
+import re
+
+
+def find_table(html, table_id):
+    '''
+    Return the <table> element with the given id, or None.
+
+    Only the markup of that table is parsed: it is located in the raw page and cut
+    out before being handed to lxml, instead of building a tree of the whole page.
+    Tables that FBref ships inside HTML comments are found as well.
+    '''
+    start = re.search(r'<table\b[^>]*\bid="%s"' % re.escape(table_id), html)
+    if start is None:
+        return None
+    end = html.find('</table>', start.end())
+    if end == -1:
+        return None
+    return lxml.html.fragment_fromstring(html[start.start():end + len('</table>')])
+
+
+def find_first_table(html, table_ids):
+    '''Return the first table found among several candidate ids, or None.'''
+    for table_id in table_ids:
+        table = find_table(html, table_id)
+        if table is not None:
+            return table
+    return None
+
+
+def cell_links(table, tag, data_stat):
+    '''hrefs of the first link of every <tag data-stat="..."> cell of a table.'''
+    links = []
+    for cell in table.iter(tag):
+        if cell.get('data-stat') == data_stat:
+            hrefs = cell.xpath('.//a/@href')
+            if hrefs:
+                links.append(hrefs[0])
+    return links
+
+
+def _expand(cells):
+    values = []
+    for cell in cells:
+        values += [cell.text_content().strip()] * int(cell.get('colspan', 1))
+    return values
+
+
+def header_names(table):
+    '''
+    Flattened column names of a table with a two-level header, named as
+    rename_columns_and_flatten does: "Playing Time : Starts", or just "Season"
+    when the upper level is empty.
+    '''
+    rows = table.xpath('./thead/tr')
+    if not rows:
+        return []
+    names = _expand(rows[-1].xpath('./th|./td'))
+    if len(rows) > 1:
+        groups = _expand(rows[-2].xpath('./th|./td'))
+        groups += [''] * (len(names) - len(groups))
+        names = [f'{group} : {name}' if group else name for group, name in zip(groups, names)]
+    return names
+
+
+def _typed(values):
+    '''Convert a column of cell texts to numbers when every non-empty cell is numeric.'''
+    numbers = []
+    for value in values:
+        if value == '':
+            numbers.append(float('nan'))
+            continue
+        try:
+            numbers.append(float(value.replace(',', '')))
+        except ValueError:
+            return np.array([value if value != '' else None for value in values], dtype=object)
+    numbers = np.array(numbers, dtype='float64')
+    if not np.isnan(numbers).any() and (numbers % 1 == 0).all():
+        return numbers.astype('int64')
+    return numbers
+
+
+def table_to_frame(table):
+    '''
+    Convert the body rows of a table straight into typed columns, without
+    serialising it back to HTML for pd.read_html.
+    '''
+    names = header_names(table)
+    rows = []
+    for row in table.xpath('./tbody/tr'):
+        if 'thead' in (row.get('class') or '').split():
+            continue
+        values = _expand(row.xpath('./th|./td'))
+        values += [''] * (len(names) - len(values))
+        rows.append(values[:len(names)])
+
+    if not rows:
+        return pd.DataFrame(columns=names)
+    columns = list(zip(*rows))
+    frame = pd.DataFrame({i: _typed(list(values)) for i, values in enumerate(columns)})
+    frame.columns = names
+    return frame
@@ -0,0 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor, Future
+from collections import deque
+from contextlib import contextmanager
+import multiprocessing
+import os
+import time
+
+from scraping_data.codes.fetching import fetch_many, host_of
+from scraping_data.codes.metrics import get_metrics
+
+
+# Processes parsing pages; 0 parses in the calling thread
+PARSE_WORKERS = os.cpu_count() or 1
+# Pages fetched but not yet consumed: fetching pauses when this many are waiting
+MAX_PENDING = 32
+
+
+def _timed_parse(parser, html, url):
+    # runs in the worker: the parse time does not include the wait in the pool queue
+    start = time.perf_counter()
+    parsed = parser(html, url)
+    return parsed, time.perf_counter() - start
+
+
+class _InlinePool:
+    '''Stands for the process pool when pages are parsed in the calling thread.'''
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        pass
+
+
+def process_pool(workers):
+    '''
+    Process pool started with forkserver, not fork: the network threads of fetch_many
+    (sessions, locks, SQLite handles) are alive when it starts, and forking them can
+    deadlock the workers. Functions submitted to it must be importable.
+    '''
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+
+
+def _new_pool(workers):
+    return process_pool(workers) if workers else _InlinePool()
+
+
+@contextmanager
+def parse_pool(workers=PARSE_WORKERS):
+    '''
+    Parsing pool shared by the fetch_and_parse calls of a run, so that its processes
+    are started once instead of once per call.
+    '''
+    pool = _new_pool(workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _result(url, future):
+    '''Parsed value of a finished future, recording its parse time and rows.'''
+    result = future.result()
+    if result is None:
+        return None
+    parsed, seconds = result
+    metrics = get_metrics()
+    metrics.observe('parse_seconds', seconds, host_of(url))
+    if hasattr(parsed, '__len__'):
+        metrics.observe('parse_rows', len(parsed), host_of(url))
+    return parsed
+
+
+def fetch_and_parse(urls, parser, workers=PARSE_WORKERS, max_pending=MAX_PENDING, pool=None):
+    '''
+    Fetch URLs with network threads and parse the pages in a process pool.
+
+    `parser(html, url)` must be a module-level function (it runs in another process);
+    it is not called for failed requests. Yields (url, response, parsed) in the order
+    of `urls`, parsed being None when the request failed. At most `max_pending` pages
+    wait to be consumed, which throttles the fetching side. `pool` is a pool from
+    parse_pool shared across calls; without it, a pool of `workers` processes is
+    started for this call.
+    '''
+    own_pool = pool is None
+    if own_pool:
+        pool = _new_pool(workers)
+    pending = deque()
+    try:
+        for url, response in fetch_many(urls):
+            if response is None or response.status_code != 200:
+                future = Future()
+                future.set_result(None)
+            else:
+                future = pool.submit(_timed_parse, parser, response.text, url)
+            pending.append((url, response, future))
+
+            while pending and (len(pending) >= max_pending or pending[0][2].done()):
+                done_url, done_response, future = pending.popleft()
+                yield done_url, done_response, _result(done_url, future)
+
+        while pending:
+            done_url, done_response, future = pending.popleft()
+            yield done_url, done_response, _result(done_url, future)
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+        else:
+            # the pool outlives this call: drop the parses nobody will consume
+            for _, _, future in pending:
+                future.cancel()
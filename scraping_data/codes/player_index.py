@@ -0,0 +1,110 @@
+from datetime import datetime
+import os
+import sqlite3
+import time
+
+from scraping_data.codes.http_cache import current_season
+
+
+PLAYER_INDEX_DB = 'scraping_data/results_csv/players_index.sqlite'
+
+# Players of the ongoing season are scraped again once their rows are older than this
+REFRESH_INTERVAL = 24 * 3600
+
+
+def player_id_from_url(player_url):
+    '''FBref player id of a player URL, e.g. "18fae4ac".'''
+    return player_url.split('/players/')[1].split('/')[0]
+
+
+def season_end(season):
+    '''Timestamp after which the rows of a season no longer change (July 1st of its last year).'''
+    return datetime(int(season[-4:]), 7, 1).timestamp()
+
+
+class PlayerIndex:
+    '''
+    Compact index of the scraped players, keyed by FBref player id and league.
+
+    `players` holds when each player page was last scraped for a league and
+    `player_seasons` the seasons it produced rows for, so a run decides what to fetch
+    without reading the dataset itself. A player page holds every season at once, so
+    whether a season is final follows from when the page was last scraped; a player
+    scraped for one league is still fetched for another, whose dataset does not hold
+    their rows yet. Writes become durable at `commit`.
+    '''
+
+    def __init__(self, path=PLAYER_INDEX_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS players (
+                player_id TEXT NOT NULL,
+                league TEXT NOT NULL,
+                name TEXT,
+                last_scraped REAL NOT NULL,
+                PRIMARY KEY (player_id, league)
+            )'''
+        )
+        self.db.execute(
+            '''CREATE TABLE IF NOT EXISTS player_seasons (
+                player_id TEXT NOT NULL,
+                league TEXT NOT NULL,
+                season TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                scraped_at REAL NOT NULL,
+                PRIMARY KEY (player_id, league, season)
+            )'''
+        )
+        self.db.commit()
+
+    def last_scraped(self, player_id, league):
+        row = self.db.execute(
+            'SELECT last_scraped FROM players WHERE player_id = ? AND league = ?', (player_id, league)
+        ).fetchone()
+        return row[0] if row else None
+
+    def needs_scrape(self, player_id, season, league, now=None):
+        '''
+        True for a player never scraped for `league`, or whose last scrape does not hold
+        the final rows of `season`. Players of the ongoing season are refreshed once
+        their rows are older than REFRESH_INTERVAL.
+        '''
+        last_scraped = self.last_scraped(player_id, league)
+        if last_scraped is None:
+            return True
+        if season == current_season():
+            return (now or time.time()) - last_scraped > REFRESH_INTERVAL
+        return last_scraped < season_end(season)
+
+    def filter(self, player_urls, season, league):
+        '''The player URLs, in order, that need to be scraped for `season` of `league`.'''
+        return [url for url in player_urls if self.needs_scrape(player_id_from_url(url), season, league)]
+
+    def record(self, player_url, name, league, seasons):
+        '''Record a scraped player page for a league and the rows it produced per season; durable at the next commit.'''
+        player_id = player_id_from_url(player_url)
+        now = time.time()
+        self.db.execute(
+            'INSERT OR REPLACE INTO players (player_id, league, name, last_scraped) VALUES (?, ?, ?, ?)',
+            (player_id, league, name, now),
+        )
+        self.db.executemany(
+            'INSERT OR REPLACE INTO player_seasons (player_id, league, season, row_count, scraped_at) VALUES (?, ?, ?, ?, ?)',
+            [(player_id, league, season, int(count), now) for season, count in seasons.items()],
+        )
+
+    def seasons(self, player_id, league):
+        return [season for (season,) in self.db.execute(
+            'SELECT season FROM player_seasons WHERE player_id = ? AND league = ? ORDER BY season', (player_id, league)
+        )]
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
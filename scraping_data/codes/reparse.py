@@ -0,0 +1,100 @@
+'''
+Rebuild the league datasets from the page archive, with no network access.
+
+Usage (from the repository root):
+    python -m scraping_data.codes.reparse [--leagues eredivisie ...] [--workers N] [--replace]
+
+Every player page the checkpoint store records as done is read back from the archive
+(archive.py) and parsed again with the current parse_player_page, in a process pool.
+The rows are merged into the league partitions, replacing the rows of the same
+players, and the league CSVs are written again; with --replace the league datasets
+are rebuilt from the archive alone. Pages served by the response cache are archived
+too, so every page the checkpoint records as done is in the archive; the pages that
+are not (fetched before the archive existed) are listed.
+'''
+import argparse
+import os
+import shutil
+
+from scraping_data.codes.FBref_engine import LEAGUES, DEFAULT_LEAGUES, BATCH_SIZE, get_league, parts_directory, parse_player_page
+from scraping_data.codes.archive import ARCHIVE_DIR, PageArchive, read_record
+from scraping_data.codes.checkpoint import ScrapeCheckpoint
+from scraping_data.codes.dataset import DATASET_DIR, export_csv, merge_partitions
+from scraping_data.codes.pipeline import PARSE_WORKERS, process_pool
+from scraping_data.codes.scheduler import Progress
+from scraping_data.codes.sink import ParquetPartSink
+
+
+REPARSE_PARTS = 'reparse'
+
+
+def _parse_archived(task):
+    # runs in the pool: the page is read from the segment here, not sent by the parent
+    directory, segment, offset, length, url = task
+    return parse_player_page(read_record(directory, segment, offset, length), url)
+
+
+def reparse(leagues=None, archive=None, checkpoint=None, root=DATASET_DIR, workers=PARSE_WORKERS, replace=False):
+    '''
+    Parse every archived player page of `leagues` (all by default) again and write the
+    rows to the league datasets. Returns the number of pages parsed.
+    '''
+    leagues = [get_league(league) for league in (leagues or LEAGUES)]
+    archive = archive or PageArchive(ARCHIVE_DIR)
+    checkpoint = checkpoint or ScrapeCheckpoint()
+
+    # A player page belongs to every league it was found in
+    player_leagues = {}
+    for key, url in checkpoint.done_urls('player', [league['key'] for league in leagues]):
+        player_leagues.setdefault(url, []).append(key)
+    located = archive.locate(player_leagues)
+    missing = [url for url in player_leagues if url not in located]
+    print(f'{len(located)} archived player pages to parse' + (f', {len(missing)} not in the archive:' if missing else ''))
+    for url in missing:
+        print(f'  not archived, fetch it again to include it: {url}')
+
+    sinks = {league['key']: ParquetPartSink(parts_directory(league, REPARSE_PARTS)) for league in leagues}
+    for sink in sinks.values():
+        sink.clear()
+        os.makedirs(sink.directory, exist_ok=True)
+
+    tasks = [(archive.directory, *location, url) for url, location in located.items()]
+    progress = Progress('reparse', len(tasks))
+    batch_players = 0
+    with process_pool(workers or 1) as pool:
+        for task, rows in zip(tasks, pool.map(_parse_archived, tasks, chunksize=16)):
+            for key in player_leagues[task[-1]]:
+                sinks[key].append(rows)
+            batch_players += 1
+            progress.update()
+            if batch_players == BATCH_SIZE:
+                for sink in sinks.values():
+                    sink.flush(REPARSE_PARTS)
+                batch_players = 0
+
+    for league in leagues:
+        sink = sinks[league['key']]
+        sink.flush(REPARSE_PARTS)
+        scraped = sink.read_all()
+        if not scraped.empty:
+            if replace:
+                shutil.rmtree(os.path.join(root, f"league={league['key']}"), ignore_errors=True)
+            seasons = merge_partitions(league['key'], scraped, root)
+            print(f"{league['key']}: {len(scraped)} rows, {len(seasons)} season partitions written")
+            # the league CSV follows the dataset, as after a scraping run (see FBref_engine.merge_into_dataset)
+            export_csv(league, root=root)
+        sink.clear()
+    return len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leagues', nargs='+', default=DEFAULT_LEAGUES, choices=list(LEAGUES))
+    parser.add_argument('--workers', type=int, default=PARSE_WORKERS)
+    parser.add_argument('--replace', action='store_true', help='rebuild the league datasets from the archive alone')
+    args = parser.parse_args()
+    reparse(args.leagues, workers=args.workers, replace=args.replace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+'''
+Record/replay of FBref and Wikipedia pages, to run the scrapers with no network.
+
+Usage (from the repository root):
+    python -m scraping_data.codes.replay record fixtures/ URL [URL ...]
+    python -m scraping_data.codes.replay serve fixtures/ [--latency 0.2] [--throttle 0.1] [--malformed 0.05]
+
+Pages are served by a local HTTP stand-in running in its own process. Within a
+`with replaying(server):` block every request of the shared session (fetch, fetch_many,
+cached_get) is sent to the stand-in instead of the real host, the response cache and
+the page archive are disabled and responses keep their original URL, so the scrapers
+run unchanged.
+The stand-in can inject latency, 429 responses and malformed tables.
+'''
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import multiprocessing
+import argparse
+import hashlib
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+from scraping_data.codes.fetching import fetch, get_session
+from scraping_data.codes.http_cache import caching
+from scraping_data.codes.archive import archiving
+from scraping_data.codes.metrics import TimedHTTPAdapter
+
+
+class FixtureStore:
+    '''
+    Captured pages on disk: one gzip file per page and an index.json mapping each URL
+    (without its scheme) to its file.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def key(url):
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        host = host[4:] if host.startswith('www.') else host
+        return host + parts.path + ('?' + parts.query if parts.query else '')
+
+    def page(self, url):
+        '''HTML of a captured page, or None.'''
+        name = self.index.get(self.key(url))
+        if name is None:
+            return None
+        with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def save(self, url, html):
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(url)
+        name = hashlib.sha1(key.encode()).hexdigest() + '.html.gz'
+        with gzip.open(os.path.join(self.directory, name), 'wt', encoding='utf-8') as f:
+            f.write(html)
+        self.index[key] = name
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=0, sort_keys=True)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def record(self, urls):
+        '''Fetch URLs from the real sites and keep them. Returns the number of pages saved.'''
+        saved = 0
+        for url in urls:
+            response = fetch(url)
+            if response is not None and response.status_code == 200:
+                self.save(url, response.text)
+                saved += 1
+            else:
+                print(f'Not recorded: {url}')
+        return saved
+
+
+class Faults:
+    '''
+    Faults injected by the stand-in, chosen from a hash of the URL so that a run is
+    reproducible.
+
+    latency: seconds added to every response (plus up to `jitter` seconds)
+    throttle: share of URLs answered 429 (with Retry-After) the first `throttle_attempts` times
+    malformed: share of pages cut in the middle of their first table
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, throttle=0.0, throttle_attempts=1, retry_after=1, malformed=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.throttle_attempts = throttle_attempts
+        self.retry_after = retry_after
+        self.malformed = malformed
+        self.seed = seed
+
+    def _draw(self, kind, key):
+        digest = hashlib.sha1(f'{self.seed}:{kind}:{key}'.encode()).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def delay(self, key):
+        return self.latency + self.jitter * self._draw('jitter', key)
+
+    def throttled(self, key, attempt):
+        return attempt < self.throttle_attempts and self._draw('throttle', key) < self.throttle
+
+    def corrupt(self, key, html):
+        if self._draw('malformed', key) >= self.malformed:
+            return html
+        start = re.search(r'<table\b', html)
+        if start is None:
+            return html
+        end = html.find('</table>', start.end())
+        # the page stops halfway through the table, as an interrupted transfer would
+        return html[:(start.end() + (end if end != -1 else len(html))) // 2]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/__stats':
+            with server.lock:
+                body = json.dumps(server.stats).encode()
+            return self._send(200, body, [('Content-Type', 'application/json')])
+
+        # /<original host>/<original path>
+        key = self.path.lstrip('/')
+        time.sleep(server.faults.delay(key))
+        with server.lock:
+            attempt = server.attempts.get(key, 0)
+            server.attempts[key] = attempt + 1
+            server.stats['requests'] += 1
+
+        if server.faults.throttled(key, attempt):
+            with server.lock:
+                server.stats['throttled'] += 1
+            return self._send(429, b'Too Many Requests', [('Retry-After', str(server.faults.retry_after))])
+
+        html = server.source.page('https://' + key)
+        if html is None:
+            with server.lock:
+                server.stats['not_found'] += 1
+            return self._send(404, b'Not Found')
+
+        body = server.faults.corrupt(key, html).encode('utf-8')
+        with server.lock:
+            server.stats['pages'] += 1
+            server.stats['bytes'] += len(body)
+        self._send(200, body, [('Content-Type', 'text/html; charset=utf-8')])
+
+
+def _serve(source, faults, port, ready):
+    server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+    server.daemon_threads = True
+    server.source = source
+    server.faults = faults
+    server.lock = threading.Lock()
+    server.attempts = {}
+    server.stats = {'requests': 0, 'pages': 0, 'throttled': 0, 'not_found': 0, 'bytes': 0}
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class ReplayServer:
+    '''
+    Local HTTP stand-in serving the pages of `source` (anything with a `page(url)`
+    method: a FixtureStore, a synthetic_pages.SyntheticLeague, ...) in a separate
+    process, so that serving pages does not compete with the scraper for the GIL.
+    '''
+
+    def __init__(self, source, faults=None, port=0):
+        self.source = source
+        self.faults = faults or Faults()
+        self.port = port
+        self.process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(self.source, self.faults, self.port, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=30)
+        return self
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def stats(self):
+        '''Requests, pages, 429s, 404s and bytes served so far.'''
+        return requests.get(self.url + '/__stats', timeout=10).json()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class ReplayAdapter(TimedHTTPAdapter):
+    '''Transport adapter sending every request to the stand-in, as /<host>/<path>.'''
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        original = request.url
+        parts = urlsplit(original)
+        host = parts.netloc.lower()
+        host = host[4:] if host.startswith('www.') else host
+        request.url = f'{self.base_url}/{host}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+        response = super().send(request, **kwargs)
+        response.url = original
+        request.url = original
+        return response
+
+
+@contextmanager
+def replaying(server, session=None):
+    '''Send the requests of the shared session to `server` within a with block, with no response cache or archive.'''
+    session = session or get_session()
+    adapters = dict(session.adapters)
+    adapter = ReplayAdapter(server.url, pool_connections=4, pool_maxsize=32)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    try:
+        with caching(None), archiving(None):
+            yield session
+    finally:
+        session.adapters.clear()
+        session.adapters.update(adapters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'serve'])
+    parser.add_argument('directory')
+    parser.add_argument('urls', nargs='*')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=0.0)
+    parser.add_argument('--malformed', type=float, default=0.0)
+    args = parser.parse_args()
+
+    store = FixtureStore(args.directory)
+    if args.command == 'record':
+        print(f'{store.record(args.urls)} pages recorded in {args.directory}')
+        return
+
+    faults = Faults(latency=args.latency, throttle=args.throttle, malformed=args.malformed)
+    with ReplayServer(store, faults, args.port) as server:
+        print(f'Serving {len(store.index)} pages on {server.url} (Ctrl-C to stop)')
+        try:
+            server.process.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
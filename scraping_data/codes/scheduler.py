@@ -0,0 +1,201 @@
+'''
+Backfill of several leagues and seasons as one resumable job.
+
+Usage (from the repository root):
+    python -m scraping_data.codes.scheduler --leagues top5 eredivisie primeiraliga --seasons 2015-2016 2016-2017
+
+Every league and season is listed first (league pages, then club pages). The player
+pages found are deduplicated: an all-competitions player page holds every season of a
+player, so it is fetched once even if the player appears in several seasons or leagues.
+All requests share the per-host rate limiters of fetching.py. A crash or Ctrl-C loses at
+most one batch: the next run skips what the checkpoint and the player index hold, the
+league and club pages already listed included (see discover).
+'''
+import argparse
+import time
+
+from scraping_data.codes.FBref_engine import (
+    LEAGUES, DEFAULT_LEAGUES, ALLOWED_SEASONS, BATCH_SIZE, get_league, league_url, parts_directory, get_club_urls,
+    parse_club_page, parse_player_page, player_name_from_url, merge_into_dataset,
+)
+from scraping_data.codes.checkpoint import ScrapeCheckpoint, DONE, FAILED
+from scraping_data.codes.fetching import fetch_many
+from scraping_data.codes.http_cache import current_season
+from scraping_data.codes.metrics import get_metrics
+from scraping_data.codes.pipeline import fetch_and_parse, parse_pool
+from scraping_data.codes.player_index import PlayerIndex, REFRESH_INTERVAL, player_id_from_url
+from scraping_data.codes.sink import ParquetPartSink
+
+
+BACKFILL_PARTS = 'backfill'
+
+
+class Progress:
+    '''Prints done/total, throughput and ETA every `every` items or `interval` seconds.'''
+
+    def __init__(self, label, total, every=25, interval=30):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.every = every
+        self.interval = interval
+        self.start = self.last_print = time.monotonic()
+
+    def update(self, count=1):
+        self.done += count
+        now = time.monotonic()
+        if self.done % self.every == 0 or now - self.last_print >= self.interval or self.done == self.total:
+            self.last_print = now
+            print(self.report(now))
+
+    def report(self, now=None):
+        elapsed = (now or time.monotonic()) - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '?'
+        share = 100 * self.done / self.total if self.total else 100.0
+        return f'[{self.label}] {self.done}/{self.total} ({share:.1f}%)  {rate:.2f}/s  ETA {eta_text}'
+
+
+def discover(jobs, checkpoint):
+    '''
+    List the clubs, then the players, of every (league, season) job.
+
+    What the checkpoint holds is reused: the club list of a past season, and the
+    players of the clubs already done (for the ongoing season, those done less than
+    REFRESH_INTERVAL ago). Only the other league and club pages are fetched.
+
+    Returns an insertion-ordered dict {player_url: [(league_key, season), ...]}.
+    '''
+    club_jobs = []
+    for league, season in jobs:
+        key = league['key']
+        ongoing = season == current_season()
+        # the clubs of a past season do not change
+        club_urls = [] if ongoing else checkpoint.urls(key, season, 'club')
+        if not club_urls:
+            try:
+                club_urls = get_club_urls(league_url(league, season), season, league)
+            except ValueError as e:
+                print(f'Error for {key} {season}: {e}')
+                continue
+            checkpoint.add(key, season, club_urls, 'club')
+        todo = set(checkpoint.todo(key, season, club_urls, REFRESH_INTERVAL if ongoing else None))
+        club_jobs += [(club_url, league, season, club_url in todo) for club_url in club_urls]
+
+    players = {}
+    progress = Progress('clubs', len(club_jobs))
+    by_url = {}
+    for club_url, league, season, todo in club_jobs:
+        if todo:
+            by_url.setdefault(club_url, []).append((league, season))
+            continue
+        # a club already done: its players are those the checkpoint recorded
+        for player_url in checkpoint.urls(league['key'], season, 'player', parent=club_url):
+            players.setdefault(player_url, []).append((league['key'], season))
+        progress.update()
+    print(f'{len(club_jobs) - sum(len(jobs) for jobs in by_url.values())} clubs from the checkpoint, {len(by_url)} club pages to fetch')
+    for club_url, response in fetch_many(list(by_url)):
+        for league, season in by_url[club_url]:
+            key = league['key']
+            player_urls = parse_club_page(response.text, league) if response is not None and response.status_code == 200 else None
+            if player_urls is None:
+                checkpoint.mark(key, season, club_url, FAILED, error='no players table')
+            else:
+                checkpoint.add(key, season, player_urls, 'player', parent=club_url)
+                checkpoint.mark(key, season, club_url, DONE, row_count=len(player_urls))
+                for player_url in player_urls:
+                    players.setdefault(player_url, []).append((key, season))
+            progress.update()
+    checkpoint.commit()
+    return players
+
+
+def run_backfill(leagues, seasons, checkpoint=None, index=None):
+    '''
+    Scrape every league x season pair of the matrix as one job and merge the rows
+    into each league dataset. Returns the number of player pages fetched.
+    '''
+    leagues = [get_league(league) for league in leagues]
+    checkpoint = checkpoint or ScrapeCheckpoint()
+    index = index or PlayerIndex()
+    metrics = get_metrics()
+    metrics.reset()
+
+    players = discover([(league, season) for league in leagues for season in seasons], checkpoint)
+    to_scrape = [
+        url for url, appearances in players.items()
+        if any(index.needs_scrape(player_id_from_url(url), season, key) for key, season in appearances)
+    ]
+    appearances_count = sum(len(appearances) for appearances in players.values())
+    print(f'{appearances_count} player appearances, {len(players)} distinct players, {len(to_scrape)} to scrape')
+
+    # One sink per league: a player's rows go to every league they were found in
+    sinks = {league['key']: ParquetPartSink(parts_directory(league, BACKFILL_PARTS)) for league in leagues}
+
+    def flush():
+        for sink in sinks.values():
+            sink.flush('backfill')
+        index.commit()
+        checkpoint.commit()
+
+    def scrape(player_urls, progress):
+        '''Fetch, parse and record player pages; returns the URLs that failed.'''
+        failed_urls = []
+        batch_players = 0
+        for player_url, response, player_stats in fetch_and_parse(player_urls, parse_player_page, pool=pool):
+            failed = response is None or response.status_code != 200
+            for key, season in players[player_url]:
+                if failed:
+                    error = 'network error' if response is None else f'HTTP {response.status_code}'
+                    checkpoint.mark(key, season, player_url, FAILED, error=error)
+                else:
+                    checkpoint.mark(key, season, player_url, DONE, row_count=len(player_stats))
+            if failed:
+                failed_urls.append(player_url)
+            else:
+                seasons_found = player_stats['Season'].value_counts().to_dict() if not player_stats.empty else {}
+                for key in {key for key, _ in players[player_url]}:
+                    sinks[key].append(player_stats)
+                    index.record(player_url, player_name_from_url(player_url), key, seasons_found)
+            batch_players += 1
+            progress.update()
+
+            if batch_players == BATCH_SIZE:
+                flush()
+                batch_players = 0
+        flush()
+        return failed_urls
+
+    # One parsing pool for the run, shared by the first pass and the retries
+    with parse_pool() as pool:
+        failed_urls = scrape(to_scrape, Progress('players', len(to_scrape)))
+        # Failed pages are re-queued once, after every other page: a throttled host has had time to recover
+        if failed_urls:
+            failed_urls = scrape(failed_urls, Progress('retries', len(failed_urls)))
+            print(f'{len(failed_urls)} player pages still failing, left for the next run')
+
+    metrics.write()
+    print(metrics.report())
+
+    # Assemble each league dataset once
+    for league in leagues:
+        scraped = sinks[league['key']].read_all()
+        if not scraped.empty:
+            print(f"Merging {len(scraped)} rows into the {league['key']} partitions of the dataset")
+            merge_into_dataset(league, scraped)
+        sinks[league['key']].clear()
+
+    return len(to_scrape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leagues', nargs='+', default=DEFAULT_LEAGUES, choices=list(LEAGUES))
+    parser.add_argument('--seasons', nargs='+', default=ALLOWED_SEASONS)
+    args = parser.parse_args()
+    run_backfill(args.leagues, args.seasons)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+'''
+Canonical schema of the scraped FBref player statistics.
+
+Every FBref header (as flattened by the scrapers, e.g. "Performance : G+A") maps to one
+canonical column with a compact dtype, so every scraped frame comes out with the same
+columns in the same order, whatever the page layout. Bump SCHEMA_VERSION when a column
+is renamed or its dtype changes.
+'''
+import logging
+import numpy as np
+import pandas as pd
+import re
+
+
+SCHEMA_VERSION = 2
+
+COUNT = 'Int16'
+LARGE_COUNT = 'Int32'  # passing and carrying distances, in yards
+RATE = 'float32'
+TEXT = 'string'
+CATEGORY = 'category'
+
+# Canonical columns, in output order, with their dtype
+COLUMNS = {
+    'Player': TEXT,
+    'Player ID': TEXT,
+    'Season': TEXT,
+    'Age': 'Int8',
+    'Squad': CATEGORY,
+    'Country': CATEGORY,
+    'Comp': CATEGORY,
+    'LgRank': TEXT,
+    'MP': COUNT,
+    'Playing Time : Starts': COUNT,
+    'Playing Time : Min': COUNT,
+    'Playing Time : 90s': RATE,
+    'Performance : Gls': COUNT,
+    'Performance : Ast': COUNT,
+    'Performance : G+A': COUNT,
+    'Performance : G-PK': COUNT,
+    'Performance : PK': COUNT,
+    'Performance : PKatt': COUNT,
+    'Performance : CrdY': COUNT,
+    'Performance : CrdR': COUNT,
+    'Expected : xG': RATE,
+    'Expected : npxG': RATE,
+    'Expected : xAG': RATE,
+    'Expected : npxG+xAG': RATE,
+    'Progression : PrgC': COUNT,
+    'Progression : PrgP': COUNT,
+    'Progression : PrgR': COUNT,
+    'Per 90 Minutes : Gls': RATE,
+    'Per 90 Minutes : Ast': RATE,
+    'Per 90 Minutes : G+A': RATE,
+    'Per 90 Minutes : G-PK': RATE,
+    'Per 90 Minutes : G+A-PK': RATE,
+    'Per 90 Minutes : xG': RATE,
+    'Per 90 Minutes : xAG': RATE,
+    'Per 90 Minutes : xG+xAG': RATE,
+    'Per 90 Minutes : npxG': RATE,
+    'Per 90 Minutes : npxG+xAG': RATE,
+    'Matches': CATEGORY,
+}
+
+
+def _table(label, columns):
+    '''Canonical columns of another player page table, prefixed with its label: "Shooting : Standard : Sh".'''
+    return {f'{label} : {name}': dtype for name, dtype in columns}
+
+
+# Tables extracted alongside the standard one (see FBref_engine.PLAYER_TABLES)
+COLUMNS.update(_table('Shooting', [
+    ('Standard : Gls', COUNT), ('Standard : Sh', COUNT), ('Standard : SoT', COUNT), ('Standard : SoT%', RATE),
+    ('Standard : Sh/90', RATE), ('Standard : SoT/90', RATE), ('Standard : G/Sh', RATE), ('Standard : G/SoT', RATE),
+    ('Standard : Dist', RATE), ('Standard : FK', COUNT), ('Standard : PK', COUNT), ('Standard : PKatt', COUNT),
+    ('Expected : xG', RATE), ('Expected : npxG', RATE), ('Expected : npxG/Sh', RATE), ('Expected : G-xG', RATE),
+    ('Expected : np:G-xG', RATE),
+]))
+COLUMNS.update(_table('Passing', [
+    ('Total : Cmp', COUNT), ('Total : Att', COUNT), ('Total : Cmp%', RATE),
+    ('Total : TotDist', LARGE_COUNT), ('Total : PrgDist', LARGE_COUNT),
+    ('Short : Cmp', COUNT), ('Short : Att', COUNT), ('Short : Cmp%', RATE),
+    ('Medium : Cmp', COUNT), ('Medium : Att', COUNT), ('Medium : Cmp%', RATE),
+    ('Long : Cmp', COUNT), ('Long : Att', COUNT), ('Long : Cmp%', RATE),
+    ('Ast', COUNT), ('xAG', RATE), ('Expected : xA', RATE), ('Expected : A-xAG', RATE),
+    ('KP', COUNT), ('1/3', COUNT), ('PPA', COUNT), ('CrsPA', COUNT), ('PrgP', COUNT),
+]))
+COLUMNS.update(_table('Defense', [
+    ('Tackles : Tkl', COUNT), ('Tackles : TklW', COUNT), ('Tackles : Def 3rd', COUNT),
+    ('Tackles : Mid 3rd', COUNT), ('Tackles : Att 3rd', COUNT),
+    ('Challenges : Tkl', COUNT), ('Challenges : Att', COUNT), ('Challenges : Tkl%', RATE), ('Challenges : Lost', COUNT),
+    ('Blocks : Blocks', COUNT), ('Blocks : Sh', COUNT), ('Blocks : Pass', COUNT),
+    ('Int', COUNT), ('Tkl+Int', COUNT), ('Clr', COUNT), ('Err', COUNT),
+]))
+COLUMNS.update(_table('Possession', [
+    ('Touches : Touches', COUNT), ('Touches : Def Pen', COUNT), ('Touches : Def 3rd', COUNT),
+    ('Touches : Mid 3rd', COUNT), ('Touches : Att 3rd', COUNT), ('Touches : Att Pen', COUNT), ('Touches : Live', COUNT),
+    ('Take-Ons : Att', COUNT), ('Take-Ons : Succ', COUNT), ('Take-Ons : Succ%', RATE),
+    ('Take-Ons : Tkld', COUNT), ('Take-Ons : Tkld%', RATE),
+    ('Carries : Carries', COUNT), ('Carries : TotDist', LARGE_COUNT), ('Carries : PrgDist', LARGE_COUNT),
+    ('Carries : PrgC', COUNT), ('Carries : 1/3', COUNT), ('Carries : CPA', COUNT),
+    ('Carries : Mis', COUNT), ('Carries : Dis', COUNT),
+    ('Receiving : Rec', COUNT), ('Receiving : PrgR', COUNT),
+]))
+
+# Other headers FBref has used for a canonical column
+ALIASES = {
+    'Playing Time : MP': 'MP',
+    'Expected : xA': 'Expected : xAG',
+    'Expected : npxG+xA': 'Expected : npxG+xAG',
+    'Per 90 Minutes : xA': 'Per 90 Minutes : xAG',
+    'Per 90 Minutes : xG+xA': 'Per 90 Minutes : xG+xAG',
+    'Per 90 Minutes : npxG+xA': 'Per 90 Minutes : npxG+xAG',
+    'Passing : xA': 'Passing : Expected : xA',
+    'Passing : A-xA': 'Passing : Expected : A-xAG',
+    'Passing : Expected : A-xA': 'Passing : Expected : A-xAG',
+    'Possession : Dribbles : Att': 'Possession : Take-Ons : Att',
+    'Possession : Dribbles : Succ': 'Possession : Take-Ons : Succ',
+    'Possession : Dribbles : Succ%': 'Possession : Take-Ons : Succ%',
+}
+
+# Columns that are expected but not part of the stored schema
+IGNORED = {'league'}
+
+_reported = set()
+
+
+def canonical_name(name):
+    '''Canonical column of a header, or None when the header is unknown or ignored.'''
+    name = str(name)
+    if name in COLUMNS:
+        return name
+    if name in ALIASES:
+        return ALIASES[name]
+    # MP.1, Matches.2: duplicate headers renamed by pd.read_csv / dedupe_columns
+    base = re.sub(r'\.\d+$', '', name)
+    if base != name:
+        return canonical_name(base)
+    return None
+
+
+def report_unknown(name):
+    '''Log an unknown header, once per process.'''
+    name = str(name)
+    if name.startswith('Unnamed: ') or name in IGNORED or name in _reported:
+        return
+    _reported.add(name)
+    logging.warning(f"Unknown FBref column '{name}' dropped (schema version {SCHEMA_VERSION})")
+
+
+def unknown_columns():
+    '''Unknown headers met so far in this process.'''
+    return sorted(_reported)
+
+
+def _numbers(values):
+    '''float64 array of a column; text that is not a number becomes NaN.'''
+    if values.dtype.kind not in 'iuf':
+        text = values.astype('string').str.replace(',', '', regex=False)
+        # ages are sometimes written years-days, e.g. "25-123"
+        text = text.str.replace(r'^(\d+)-\d{1,3}$', r'\1', regex=True)
+        values = pd.to_numeric(text, errors='coerce')
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def convert(values, dtype):
+    '''Cast a column to a registry dtype; values that do not fit become missing.'''
+    if dtype == TEXT:
+        return values.astype('string')
+    if dtype == CATEGORY:
+        return values.astype('string').astype('category')
+    numbers = _numbers(values)
+    if dtype.startswith('Int'):
+        limits = np.iinfo(dtype.lower())
+        with np.errstate(invalid='ignore'):
+            mask = np.isnan(numbers) | (numbers < limits.min) | (numbers > limits.max)
+        data = np.where(mask, 0, np.round(numbers)).astype(dtype.lower())
+        return pd.Series(pd.arrays.IntegerArray(data, mask), index=values.index)
+    return pd.Series(numbers.astype(dtype), index=values.index)
+
+
+def align(frame):
+    '''
+    Return `frame` with the canonical columns, in registry order and with registry dtypes.
+    Missing columns are added empty, headers met several times are merged (first
+    non-missing value wins) and unknown headers are dropped and reported.
+    '''
+    raw = {}
+    for name, values in frame.items():
+        canonical = canonical_name(name)
+        if canonical is None:
+            report_unknown(name)
+            continue
+        if canonical in raw:
+            values = raw[canonical].astype(object).where(raw[canonical].notna(), values.astype(object))
+        raw[canonical] = values
+
+    # one DataFrame construction: inserting the columns one by one costs more than parsing the page
+    missing = pd.Series(pd.NA, index=frame.index, dtype=object)
+    return pd.DataFrame(
+        {name: convert(raw.get(name, missing), dtype) for name, dtype in COLUMNS.items()},
+        index=frame.index,
+    )
+
+
+def apply_dtypes(frame):
+    '''Cast the known columns of a frame read back from storage to their registry dtypes.'''
+    for name in frame.columns:
+        if name in COLUMNS:
+            frame[name] = convert(frame[name], COLUMNS[name])
+    return frame
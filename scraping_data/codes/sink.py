@@ -0,0 +1,76 @@
+import pandas as pd
+import os
+import re
+import shutil
+
+
+def dedupe_columns(columns):
+    '''Make column names unique the way pd.read_csv does: MP, MP.1, MP.2, ...'''
+    seen = {}
+    new_columns = []
+    for col in columns:
+        if col in seen:
+            seen[col] += 1
+            new_columns.append(f'{col}.{seen[col]}')
+        else:
+            seen[col] = 0
+            new_columns.append(col)
+    return new_columns
+
+
+def _writable(frame):
+    '''Unique column names and text object columns, so any scraped frame can be written to Parquet.'''
+    frame = frame.copy()
+    frame.columns = dedupe_columns([str(col) for col in frame.columns])
+    for col in frame.columns[frame.dtypes == object]:
+        frame[col] = frame[col].astype('string')
+    return frame
+
+
+class ParquetPartSink:
+    '''
+    Append-only columnar sink for scraped rows.
+
+    Frames are buffered in memory and each `flush` writes them as one Parquet part
+    file (one per club in the scraper), so memory only holds the current batch.
+    `read_all` assembles every part with a single concatenation. Parts left over
+    by an interrupted run are kept and picked up when the run resumes.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.buffer = []
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, frame):
+        if not frame.empty:
+            self.buffer.append(_writable(frame))
+
+    def part_files(self):
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith('.parquet')
+        )
+
+    def flush(self, name='batch'):
+        '''Write the buffered frames as a new part file. Returns the number of rows written.'''
+        if not self.buffer:
+            return 0
+        batch = _writable(pd.concat(self.buffer, ignore_index=True))
+        self.buffer = []
+        safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', name)
+        path = os.path.join(self.directory, f'part-{len(self.part_files()):05d}-{safe_name}.parquet')
+        batch.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        return len(batch)
+
+    def read_all(self):
+        '''Return every flushed row as one DataFrame.'''
+        parts = [pd.read_parquet(path) for path in self.part_files()]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+    def clear(self):
+        self.buffer = []
+        shutil.rmtree(self.directory, ignore_errors=True)
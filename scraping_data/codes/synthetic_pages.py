@@ -0,0 +1,333 @@
+'''Synthetic FBref-like and Wikipedia-like pages, for benchmarks and offline runs of the scrapers.'''
+from urllib.parse import parse_qs, urlsplit, unquote
+import json
+import random
+import re
+
+
+STANDARD_COLUMNS = [
+    ('', 'Season', 'year_id'), ('', 'Age', 'age'), ('', 'Squad', 'team'), ('', 'Country', 'country'),
+    ('', 'Comp', 'comp_level'), ('', 'LgRank', 'lg_finish'), ('', 'MP', 'games'),
+    ('Playing Time', 'Starts', 'games_starts'), ('Playing Time', 'Min', 'minutes'), ('Playing Time', '90s', 'minutes_90s'),
+    ('Performance', 'Gls', 'goals'), ('Performance', 'Ast', 'assists'), ('Performance', 'G+A', 'goals_assists'),
+    ('Performance', 'G-PK', 'goals_pens'), ('Performance', 'PK', 'pens_made'), ('Performance', 'PKatt', 'pens_att'),
+    ('Performance', 'CrdY', 'cards_yellow'), ('Performance', 'CrdR', 'cards_red'),
+    ('Expected', 'xG', 'xg'), ('Expected', 'npxG', 'npxg'), ('Expected', 'xAG', 'xg_assist'), ('Expected', 'npxG+xAG', 'npxg_xg_assist'),
+    ('Progression', 'PrgC', 'progressive_carries'), ('Progression', 'PrgP', 'progressive_passes'), ('Progression', 'PrgR', 'progressive_passes_received'),
+    ('Per 90 Minutes', 'Gls', 'goals_per90'), ('Per 90 Minutes', 'Ast', 'assists_per90'), ('Per 90 Minutes', 'G+A', 'goals_assists_per90'),
+    ('Per 90 Minutes', 'G-PK', 'goals_pens_per90'), ('Per 90 Minutes', 'G+A-PK', 'goals_assists_pens_per90'),
+    ('Per 90 Minutes', 'xG', 'xg_per90'), ('Per 90 Minutes', 'xAG', 'xg_assist_per90'), ('Per 90 Minutes', 'xG+xAG', 'xg_xg_assist_per90'),
+    ('Per 90 Minutes', 'npxG', 'npxg_per90'), ('Per 90 Minutes', 'npxG+xAG', 'npxg_xg_assist_per90'),
+    ('', 'Matches', 'matches'),
+]
+
+_IDENTITY = STANDARD_COLUMNS[:6]
+_TAIL = [('', '90s', 'minutes_90s')]
+
+
+def _columns(groups):
+    return _IDENTITY + _TAIL + [
+        (group, name, f'{group}_{name}'.lower().replace(' ', '_')) for group, names in groups for name in names
+    ] + [('', 'Matches', 'matches')]
+
+
+# The other tables of a player page, keyed by the table id prefix
+PLAYER_TABLE_COLUMNS = {
+    'stats_shooting': _columns([
+        ('Standard', ['Gls', 'Sh', 'SoT', 'SoT%', 'Sh/90', 'SoT/90', 'G/Sh', 'G/SoT', 'Dist', 'FK', 'PK', 'PKatt']),
+        ('Expected', ['xG', 'npxG', 'npxG/Sh', 'G-xG', 'np:G-xG']),
+    ]),
+    'stats_passing': _columns([
+        ('Total', ['Cmp', 'Att', 'Cmp%', 'TotDist', 'PrgDist']), ('Short', ['Cmp', 'Att', 'Cmp%']),
+        ('Medium', ['Cmp', 'Att', 'Cmp%']), ('Long', ['Cmp', 'Att', 'Cmp%']), ('', ['Ast', 'xAG']),
+        ('Expected', ['xA', 'A-xAG']), ('', ['KP', '1/3', 'PPA', 'CrsPA', 'PrgP']),
+    ]),
+    'stats_defense': _columns([
+        ('Tackles', ['Tkl', 'TklW', 'Def 3rd', 'Mid 3rd', 'Att 3rd']), ('Challenges', ['Tkl', 'Att', 'Tkl%', 'Lost']),
+        ('Blocks', ['Blocks', 'Sh', 'Pass']), ('', ['Int', 'Tkl+Int', 'Clr', 'Err']),
+    ]),
+    'stats_possession': _columns([
+        ('Touches', ['Touches', 'Def Pen', 'Def 3rd', 'Mid 3rd', 'Att 3rd', 'Att Pen', 'Live']),
+        ('Take-Ons', ['Att', 'Succ', 'Succ%', 'Tkld', 'Tkld%']),
+        ('Carries', ['Carries', 'TotDist', 'PrgDist', 'PrgC', '1/3', 'CPA', 'Mis', 'Dis']), ('Receiving', ['Rec', 'PrgR']),
+    ]),
+}
+
+SEASONS = [f'{year}-{year + 1}' for year in range(2010, 2025)]
+
+
+def _over_header(columns):
+    cells = []
+    for group, _, _ in columns:
+        if cells and cells[-1][0] == group:
+            cells[-1][1] += 1
+        else:
+            cells.append([group, 1])
+    return ''.join(
+        f'<th aria-label="" data-stat="" colspan="{span}" class=" over_header center">{group}</th>'
+        for group, span in cells
+    )
+
+
+def _cell(name, stat, season, rng):
+    if stat == 'year_id':
+        return f'<th scope="row" class="left " data-stat="year_id"><a href="/en/players/x/{season}">{season}</a></th>'
+    if name == 'Age':
+        value = str(rng.randint(17, 36))
+    elif name == 'Squad':
+        value = f'<a href="/en/squads/{rng.randrange(16 ** 8):08x}/">Club {rng.randint(1, 99)}</a>'
+    elif name == 'Country':
+        value = '<a href="/en/country/NED/"><span class="f-i f-nl">nl</span> NED</a>'
+    elif name == 'Comp':
+        value = '<a href="/en/comps/23/">1. Eredivisie</a>'
+    elif name == 'LgRank':
+        value = f'{rng.randint(1, 18)}th'
+    elif name == 'Matches':
+        value = '<a href="/en/players/x/matchlogs/">Matches</a>'
+    elif stat in ('minutes',):
+        value = f'{rng.randint(0, 3400):,}'
+    elif stat.endswith('per90') or stat.startswith(('xg', 'npxg')) or stat == 'minutes_90s':
+        value = f'{rng.random() * 2:.2f}'
+    else:
+        value = str(rng.randint(0, 38))
+    return f'<td class="right " data-stat="{stat}">{value}</td>'
+
+
+def stats_table(table_id, seasons, rng, columns=STANDARD_COLUMNS, squads=None):
+    '''
+    An FBref statistics table with a two-level header and one row per season. `squads`
+    ({season: Squad cell}) makes several tables of a page agree on the clubs.
+    '''
+    header = ''.join(f'<th aria-label="{name}" data-stat="{stat}" scope="col">{name}</th>' for _, name, stat in columns)
+    rows = ''.join(
+        '<tr>' + ''.join(
+            squads[season] if squads and name == 'Squad' else _cell(name, stat, season, rng)
+            for _, name, stat in columns
+        ) + '</tr>'
+        for season in seasons
+    )
+    return (
+        f'<table class="stats_table sortable min_width" id="{table_id}" data-cols-to-freeze=",1">'
+        f'<caption>Standard Stats Table</caption>'
+        f'<thead><tr class="over_header">{_over_header(columns)}</tr><tr>{header}</tr></thead>'
+        f'<tbody>{rows}</tbody>'
+        f'<tfoot><tr><th data-stat="year_id">{len(seasons)} Seasons</th></tr></tfoot>'
+        f'</table>'
+    )
+
+
+def player_page(name='Joey Veerman', n_seasons=10, n_other_tables=12, seed=0):
+    '''
+    A player "All Competitions" page: the stats_standard_expanded table surrounded by
+    navigation markup and other tables, some inside HTML comments as FBref ships them.
+    '''
+    rng = random.Random(seed)
+    seasons = SEASONS[-n_seasons:]
+    squads = {season: _cell('Squad', 'team', season, rng) for season in seasons}
+    navigation = ''.join(f'<li><a href="/en/comps/{i}/">Competition {i}</a></li>' for i in range(400))
+    # the shooting, passing, ... tables first, then unrelated ones; every other table is commented out
+    other_tables = []
+    for i, (prefix, columns) in enumerate(PLAYER_TABLE_COLUMNS.items()):
+        if i < n_other_tables:
+            other_tables.append(stats_table(f'{prefix}_expanded', seasons, rng, columns, squads))
+    for i in range(n_other_tables - len(other_tables)):
+        other_tables.append(stats_table(f'stats_other_{i}', seasons, rng))
+    other_tables = [
+        f'<div class="table_container"><!--\n{table}\n--></div>' if i % 2 else table
+        for i, table in enumerate(other_tables)
+    ]
+    return (
+        f'<html><head><title>{name} Stats</title></head><body>'
+        f'<div id="nav"><ul>{navigation}</ul></div>'
+        f'<div id="meta"><h1>{name}</h1></div>'
+        f'<div class="table_container">{stats_table("stats_standard_expanded", seasons, rng, squads=squads)}</div>'
+        + ''.join(other_tables) +
+        '</body></html>'
+    )
+
+
+def _slug(name):
+    return name.replace(' ', '-')
+
+
+def league_page(league, season, clubs):
+    '''A league page: the clubs table (`clubs_table_id`) linking to every club page.'''
+    rows = ''.join(
+        f'<tr><th data-stat="rank">{rank}</th>'
+        f'<td data-stat="team"><a href="/en/squads/{club_id}/{season}/{_slug(name)}-Stats">{name}</a></td>'
+        f'<td data-stat="points">{90 - 2 * rank}</td></tr>'
+        for rank, (club_id, name) in enumerate(clubs, start=1)
+    )
+    table_id = league['clubs_table_id'].format(season=season)
+    return (
+        f'<html><body><table id="{table_id}"><thead><tr><th>Rk</th><th>Squad</th><th>Pts</th></tr></thead>'
+        f'<tbody>{rows}</tbody></table></body></html>'
+    )
+
+
+def club_page(league, players):
+    '''A club page: the standard stats table of the league linking to every player page.'''
+    rows = ''.join(
+        f'<tr><th data-stat="player"><a href="/en/players/{player_id}/{_slug(name)}">{name}</a></th>'
+        f'<td data-stat="games">{random.Random(player_id).randint(1, 34)}</td></tr>'
+        for player_id, name in players
+    )
+    return (
+        f'<html><body><div class="table_container"><table id="{league["players_table_ids"][0]}">'
+        f'<thead><tr><th>Player</th><th>MP</th></tr></thead><tbody>{rows}</tbody></table></div></body></html>'
+    )
+
+
+class SyntheticLeague:
+    '''
+    A whole FBref-like league season generated on demand: league page, `n_clubs` club
+    pages and `players_per_club` player pages per club. Pages are deterministic, so
+    every run of a benchmark sees the same site. Player pages are drawn from a pool of
+    `distinct_pages` pages generated once, so that serving them costs less than
+    scraping them.
+    '''
+
+    def __init__(self, league, season, n_clubs=100, players_per_club=25, n_other_tables=12, distinct_pages=64, seed=0):
+        self.league = league
+        self.season = season
+        self.n_clubs = n_clubs
+        self.players_per_club = players_per_club
+        self.n_other_tables = n_other_tables
+        self.distinct_pages = distinct_pages
+        self.seed = seed
+        self._player_pages = {}
+
+    def clubs(self):
+        return [(f'{self.seed:02x}{club:06x}', f'Club {club}') for club in range(self.n_clubs)]
+
+    def players(self, club_id):
+        club = int(club_id, 16) & 0xffffff
+        return [
+            (f'{club:04x}{i:04x}', f'Player {club} {i}')
+            for i in range(self.players_per_club)
+        ]
+
+    def n_pages(self):
+        return 1 + self.n_clubs * (1 + self.players_per_club)
+
+    def page(self, url):
+        '''HTML of a page of the league, or None for an unknown URL.'''
+        path = urlsplit(url).path
+        if path == urlsplit(self.league['url'].format(season=self.season)).path:
+            return league_page(self.league, self.season, self.clubs())
+        match = re.match(r'/en/squads/([0-9a-f]{8})/', path)
+        if match:
+            return club_page(self.league, self.players(match.group(1)))
+        match = re.match(r'/en/players/([0-9a-f]{8})/all_comps/(.+)-Stats---All-Competitions$', path)
+        if match:
+            variant = int(match.group(1), 16) % self.distinct_pages
+            if variant not in self._player_pages:
+                self._player_pages[variant] = player_page(
+                    f'Player {variant}', n_other_tables=self.n_other_tables, seed=self.seed * 10 ** 6 + variant,
+                )
+            return self._player_pages[variant]
+        return None
+
+
+class SyntheticWikipedia:
+    '''
+    French Wikipedia-like site for the stadium crawler of using_data/mapping.py: one
+    league article per division listing its clubs, club articles whose infobox links
+    their stadium (two clubs per stadium), stadium articles with a map link, and the
+    MediaWiki API answering prop=coordinates|info queries. Every tenth stadium has no
+    coordinates in the API, only on its page, and every seventh club links its stadium
+    through a redirect. Every article is at revision 1 unless `revisions` ({title:
+    revision id}) says otherwise.
+    '''
+
+    def __init__(self, n_divisions=2, clubs_per_division=20, revisions=None):
+        self.n_divisions = n_divisions
+        self.clubs_per_division = clubs_per_division
+        self.revisions = revisions or {}
+
+    def divisions(self):
+        '''{division: league article URL}, as mapping.url_list.'''
+        return {f'D{division}': f'https://fr.wikipedia.org/wiki/Division_{division}' for division in range(self.n_divisions)}
+
+    def stadium(self, division, club):
+        return (division * self.clubs_per_division + club) // 2
+
+    def coordinates(self, stadium):
+        return round(42.5 + stadium * 0.0173 % 8, 6), round(-4.5 + stadium * 0.0291 % 12, 6)
+
+    def _league_page(self, division):
+        clubs = ''.join(
+            f'<li><span class="toponyme"><a href="/wiki/Club_{division}_{club}" title="Club {division} {club}">Club</a></span></li>'
+            for club in range(self.clubs_per_division)
+        )
+        return f'<html><body><h1>Division {division}</h1><ul>{clubs}</ul></body></html>'
+
+    def _club_page(self, division, club):
+        stadium = self.stadium(division, club)
+        target = f'Stade_{stadium}_(football)' if club % 7 == 6 else f'Stade_{stadium}'
+        return (
+            f'<html><body><table class="infobox">'
+            f'<tr><th scope="row">Fondation</th><td>{1890 + club}</td></tr>'
+            f'<tr><th scope="row">Stade</th><td><a href="/wiki/Fichier:Stade.svg">img</a>'
+            f'<a href="/wiki/{target}" title="{target.replace("_", " ")}">Stade {stadium}</a></td></tr>'
+            f'</table></body></html>'
+        )
+
+    def _stadium_page(self, stadium):
+        latitude, longitude = self.coordinates(stadium)
+        return (
+            f'<html><body><h1>Stade {stadium}</h1>'
+            f'<a class="mw-kartographer-maplink" data-lat="{latitude}" data-lon="{longitude}">Carte</a></body></html>'
+        )
+
+    def _api(self, query):
+        titles = query.get('titles', [''])[0].split('|')
+        normalized, redirects, pages = [], [], {}
+        for asked in titles:
+            title = asked.replace('_', ' ')
+            if title != asked:
+                normalized.append({'from': asked, 'to': title})
+            club = re.fullmatch(r'Club (\d+) (\d+)', title)
+            if club:
+                division, club = int(club.group(1)), int(club.group(2))
+                pages[title] = {
+                    'pageid': 200000 + division * 1000 + club, 'ns': 0, 'title': title,
+                    'lastrevid': self.revisions.get(title, 1),
+                }
+                continue
+            match = re.fullmatch(r'Stade (\d+)( \(football\))?', title)
+            if match and match.group(2):
+                redirects.append({'from': title, 'to': f'Stade {match.group(1)}'})
+                title = f'Stade {match.group(1)}'
+            if not match:
+                pages[title] = {'ns': 0, 'title': title, 'missing': True}
+                continue
+            stadium = int(match.group(1))
+            page = {'pageid': 100000 + stadium, 'ns': 0, 'title': title, 'lastrevid': self.revisions.get(title, 1)}
+            if stadium % 10 != 9:
+                latitude, longitude = self.coordinates(stadium)
+                page['coordinates'] = [{'lat': latitude, 'lon': longitude, 'primary': True, 'globe': 'earth'}]
+            pages[title] = page
+        result = {'batchcomplete': True, 'query': {'pages': list(pages.values())}}
+        if normalized:
+            result['query']['normalized'] = normalized
+        if redirects:
+            result['query']['redirects'] = redirects
+        return json.dumps(result)
+
+    def page(self, url):
+        '''Content of a page (HTML, or JSON for the API), or None for an unknown URL.'''
+        parts = urlsplit(url)
+        if parts.path == '/w/api.php':
+            return self._api(parse_qs(parts.query))
+        path = unquote(parts.path)
+        match = re.fullmatch(r'/wiki/Division_(\d+)', path)
+        if match:
+            return self._league_page(int(match.group(1)))
+        match = re.fullmatch(r'/wiki/Club_(\d+)_(\d+)', path)
+        if match:
+            return self._club_page(int(match.group(1)), int(match.group(2)))
+        match = re.fullmatch(r'/wiki/Stade_(\d+)(_\(football\))?', path)
+        if match:
+            return self._stadium_page(int(match.group(1)))
+        return None
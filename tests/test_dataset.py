@@ -0,0 +1,59 @@
+"""
+Parquet dataset of dataset.py: one row per (player, season), rows of a new scrape
+replacing the stored ones, and the league CSV written back with its layout.
+"""
+import csv
+
+import pandas as pd
+
+from scraping_data.codes.dataset import drop_duplicate_rows, export_csv, merge_partitions, read_partition
+
+
+SEASON = "2023-2024"
+
+
+def rows(*players, season=SEASON):
+    """Rows of (name, id, age); an id of None is a row of the former scrapers."""
+    return pd.DataFrame(
+        [{"Player": name, "Player ID": player_id, "Season": season, "Age": age} for name, player_id, age in players]
+    )
+
+
+def test_drop_duplicate_rows_keeps_the_first_row():
+    frame = rows(("A", "a1", 20), ("B", "b1", 21), ("A", "a1", 30), ("C", None, 22), ("C", None, 32), ("B", "b1", 31))
+    kept = drop_duplicate_rows(frame)
+    assert kept[["Player", "Age"]].values.tolist() == [["A", 20], ["B", 21], ["C", 22]]
+
+
+def test_drop_duplicate_rows_prefers_rows_with_an_id():
+    # homonyms with different ids are two players; a legacy row of a player scraped again is dropped
+    frame = rows(("A", None, 20), ("A", "a1", 21), ("A", "a2", 22), ("B", None, 23))
+    kept = drop_duplicate_rows(frame)
+    assert kept["Age"].tolist() == [21, 22, 23]
+    assert kept["Player ID"].isna().tolist() == [False, False, True]
+
+
+def test_merge_replaces_the_rows_scraped_again(tmp_path):
+    root = str(tmp_path)
+    assert merge_partitions("eredivisie", rows(("A", "a1", 20), ("B", None, 21), ("C", "c1", 22)), root) == [SEASON]
+    merge_partitions("eredivisie", rows(("C", "c1", 23), ("B", "b1", 22), ("D", "d1", 19)), root)
+
+    stored = read_partition("eredivisie", SEASON, root)
+    # stored rows keep their order, rows scraped again replace theirs and come with the new ones
+    assert stored["Player"].tolist() == ["A", "C", "B", "D"]
+    assert stored["Age"].tolist() == [20, 23, 22, 19]
+
+
+def test_export_keeps_the_layout_of_the_csv(tmp_path):
+    root, path = str(tmp_path / "dataset"), tmp_path / "players.csv"
+    league = {"key": "eredivisie", "output_path": str(path)}
+    # a CSV of the former scrapers: unnamed index column, its own column order
+    pd.DataFrame({"Age": [20, 21], "Player": ["B", "A"], "Season": [SEASON] * 2}).to_csv(path)
+    merge_partitions("eredivisie", pd.read_csv(path, index_col=0), root)
+    merge_partitions("eredivisie", rows(("C", "c1", 19), ("A", "a1", 22)), root)
+
+    export_csv(league, root=root)
+    with open(path, newline="") as f:
+        written = list(csv.reader(f))
+    assert written[0] == ["", "Age", "Player", "Season"]
+    assert [row[1:] for row in written[1:]] == [["20", "B", SEASON], ["22", "A", SEASON], ["19", "C", SEASON]]
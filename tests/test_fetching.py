@@ -0,0 +1,78 @@
+"""
+Retries and caching rules of the shared HTTP client: Retry-After and backoff delays,
+the per-host circuit breaker, and the time to live of the response cache.
+"""
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from scraping_data.codes import fetching
+from scraping_data.codes.fetching import BACKOFF_BASE, BACKOFF_MAX, BREAKER_THRESHOLD, CircuitBreaker, retry_delay
+from scraping_data.codes.http_cache import DAY, HOUR, current_season, ttl_for
+
+
+def response(status=429, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+def test_retry_after_is_honoured_in_full():
+    # above the backoff cap: the server asked for it
+    assert retry_delay(0, response(**{"Retry-After": str(int(BACKOFF_MAX) * 3)})) == BACKOFF_MAX * 3
+    when = datetime.now(timezone.utc) + timedelta(seconds=600)
+    assert retry_delay(0, response(**{"Retry-After": format_datetime(when, usegmt=True)})) == pytest.approx(600, abs=2)
+
+
+def test_backoff_is_jittered_and_capped():
+    for attempt in range(10):
+        cap = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+        delays = [retry_delay(attempt, response(**{"Retry-After": "soon"})) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+        assert len(set(delays)) > 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fetching.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_at_once_on_429(clock):
+    breaker = CircuitBreaker("fbref.com")
+    assert breaker.failure(30, throttled=True)
+    assert breaker.open_until == clock[0] + 30
+    # requests failing while it is open do not extend the pause
+    assert breaker.failure(60)
+    assert breaker.open_until == clock[0] + 30
+
+
+def test_breaker_opens_after_repeated_failures(clock):
+    breaker = CircuitBreaker("fbref.com")
+    for _ in range(BREAKER_THRESHOLD - 1):
+        assert not breaker.failure(0)
+    assert breaker.failure(0)
+    assert breaker.open_until == clock[0] + BACKOFF_BASE
+
+    # each reopening without a success doubles the pause; a success resets it
+    clock[0] = breaker.open_until
+    assert breaker.failure(0, throttled=True)
+    assert breaker.open_until == clock[0] + 2 * BACKOFF_BASE
+    breaker.success()
+    clock[0] = breaker.open_until
+    assert not breaker.failure(0)
+
+
+def test_cache_ttls():
+    season = current_season()
+    start = int(season[:4])
+    past = f"{start - 2}-{start - 1}"
+    assert ttl_for(f"https://fbref.com/en/comps/23/{past}/{past}-Eredivisie-Stats") is None
+    assert ttl_for(f"https://fbref.com/en/comps/23/{season}/{season}-Eredivisie-Stats") == DAY
+    assert ttl_for("https://fbref.com/en/players/0123abcd/Some-Player") == DAY
+    assert ttl_for("https://fr.wikipedia.org/wiki/Championnat_de_France_de_football") == HOUR
+    assert ttl_for("https://fr.wikipedia.org/w/api.php?action=query&titles=Stade") == 0
@@ -0,0 +1,120 @@
+"""
+Stadium crawler of using_data/mapping.py against the synthetic Wikipedia served by the
+replay stand-in: requests per crawl (API batching, fallback pages) and coordinates.
+"""
+import pytest
+
+from scraping_data.codes.fetching import host_limits
+from scraping_data.codes.replay import ReplayServer, replaying
+from scraping_data.codes.synthetic_pages import SyntheticWikipedia
+from using_data.mapping import API_BATCH, CoordinateResolver, crawl_stadiums, refresh_stadiums
+from using_data.stadium_store import StadiumStore
+
+
+@pytest.fixture
+def site():
+    return SyntheticWikipedia(n_divisions=2, clubs_per_division=20)
+
+
+@pytest.fixture(autouse=True)
+def unthrottled():
+    # the stand-in is local: the politeness limits of Wikipedia would only slow the tests down
+    with host_limits("fr.wikipedia.org", 10 ** 9, 8):
+        yield
+
+
+@pytest.fixture
+def server(site):
+    with ReplayServer(site) as server:
+        with replaying(server):
+            yield server
+
+
+class FailingWikipedia(SyntheticWikipedia):
+    """Synthetic Wikipedia whose `failing` article paths answer 404."""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+
+    def page(self, url):
+        if any(url.endswith(path) for path in self.failing):
+            return None
+        return super().page(url)
+
+
+def requests_served(server, before=0):
+    return server.stats()["requests"] - before
+
+
+def test_crawl_requests_and_coordinates(site, server):
+    stades = crawl_stadiums(site.divisions())
+
+    n_clubs = site.n_divisions * site.clubs_per_division
+    stadiums = {site.stadium(division, club) for division in range(site.n_divisions) for club in range(site.clubs_per_division)}
+    # stadiums without coordinates in the API are read from their page
+    fallback = [stadium for stadium in stadiums if stadium % 10 == 9]
+    assert len(stadiums) <= API_BATCH
+    # league pages, club pages, one API query for every stadium, fallback stadium pages
+    assert requests_served(server) == site.n_divisions + n_clubs + 1 + len(fallback)
+
+    assert len(stades) == n_clubs
+    assert stades["latitude"].notna().all() and stades["longitude"].notna().all()
+    for (division, club), row in zip(
+        ((division, club) for division in range(site.n_divisions) for club in range(site.clubs_per_division)),
+        stades.itertuples(),
+    ):
+        assert row.division == f"D{division}"
+        assert (row.latitude, row.longitude) == pytest.approx(site.coordinates(site.stadium(division, club)))
+
+
+def test_resolver_batches_and_caches(site, server):
+    resolver = CoordinateResolver()
+    titles = [f"Stade {stadium}" for stadium in range(2 * API_BATCH + 10)]
+
+    resolved = resolver.resolve(titles)
+    assert requests_served(server) == 3
+    for stadium, title in enumerate(titles):
+        if stadium % 10 == 9:
+            assert resolved[title] == (None, None)
+        else:
+            assert resolved[title] == pytest.approx(site.coordinates(stadium))
+
+    # cached titles are not asked again, redirects and new titles are
+    before = server.stats()["requests"]
+    resolved = resolver.resolve(titles + ["Stade 3 (football)"])
+    assert requests_served(server, before) == 1
+    assert resolved["Stade 3 (football)"] == pytest.approx(site.coordinates(3))
+    assert resolver.resolve(titles[:5]) and requests_served(server, before) == 1
+
+
+def test_refresh_keeps_the_stored_row_of_a_failed_club(tmp_path):
+    store = StadiumStore(str(tmp_path / "stadiums.sqlite"))
+    club = "Club 0 3"
+
+    def refresh(site):
+        with ReplayServer(site) as server, replaying(server):
+            return refresh_stadiums(site.divisions(), store=store)
+
+    stored = refresh(SyntheticWikipedia()).set_index("equipe")
+    # the club article changed, but its page cannot be fetched: the stored row is kept as is
+    site = FailingWikipedia(failing=["/wiki/Club_0_3"], revisions={club: 2})
+    kept = refresh(site)
+    row = kept[kept["club_title"] == club].iloc[0]
+    assert row["club_revision"] == 1
+    assert (row["latitude"], row["longitude"]) == pytest.approx(site.coordinates(site.stadium(0, 3)))
+    assert len(kept) == len(stored)
+
+    # the same for a stadium that cannot be located: no API coordinates and no page
+    site = FailingWikipedia(failing=["/wiki/Stade_9"], revisions={"Club 0 18": 2})
+    kept = refresh(site)
+    assert kept[kept["club_title"] == "Club 0 18"].iloc[0]["club_revision"] == 1
+
+    # once the pages are back, the clubs are crawled again and their revisions recorded
+    site = SyntheticWikipedia(revisions={club: 2, "Club 0 18": 2})
+    refreshed = refresh(site)
+    for title, stadium in ((club, site.stadium(0, 3)), ("Club 0 18", site.stadium(0, 18))):
+        row = refreshed[refreshed["club_title"] == title].iloc[0]
+        assert row["club_revision"] == 2
+        assert (row["latitude"], row["longitude"]) == pytest.approx(site.coordinates(stadium))
+    store.close()
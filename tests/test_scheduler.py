@@ -0,0 +1,69 @@
+"""
+Backfill of scheduler.py against a synthetic league served by the replay stand-in:
+a resumed run reuses what the checkpoint and the player index hold.
+"""
+import pytest
+
+from scraping_data.codes.FBref_engine import LEAGUES
+from scraping_data.codes.checkpoint import DONE, ScrapeCheckpoint
+from scraping_data.codes.fetching import host_limits
+from scraping_data.codes.player_index import PlayerIndex
+from scraping_data.codes.replay import ReplayServer, replaying
+from scraping_data.codes.scheduler import run_backfill
+from scraping_data.codes.synthetic_pages import SyntheticLeague
+
+
+SEASON = "2023-2024"
+
+
+@pytest.fixture
+def site():
+    return SyntheticLeague(LEAGUES["eredivisie"], SEASON, n_clubs=4, players_per_club=3)
+
+
+@pytest.fixture
+def server(site, tmp_path, monkeypatch):
+    # the checkpoint, index, parts and dataset are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    with ReplayServer(site) as server, host_limits("fbref.com", 10 ** 9, 8):
+        with replaying(server):
+            yield server
+
+
+def backfill():
+    checkpoint, index = ScrapeCheckpoint(), PlayerIndex()
+    try:
+        return run_backfill(["eredivisie"], [SEASON], checkpoint=checkpoint, index=index)
+    finally:
+        checkpoint.close()
+        index.close()
+
+
+def test_resumed_backfill_fetches_nothing_again(site, server):
+    n_players = site.n_clubs * site.players_per_club
+    assert backfill() == n_players
+    # league page, club pages, player pages
+    assert server.stats()["requests"] == 1 + site.n_clubs + n_players
+
+    assert backfill() == 0
+    assert server.stats()["requests"] == 1 + site.n_clubs + n_players
+
+
+def test_backfill_resumes_after_the_last_done_club(site, server):
+    assert backfill() == site.n_clubs * site.players_per_club
+    checkpoint = ScrapeCheckpoint()
+    clubs = checkpoint.urls("eredivisie", SEASON, "club")
+    assert len(clubs) == site.n_clubs
+    # as if the run had stopped before the last club
+    checkpoint.db.execute("UPDATE urls SET status = 'pending' WHERE url = ?", (clubs[-1],))
+    checkpoint.commit()
+    checkpoint.close()
+
+    before = server.stats()["requests"]
+    assert backfill() == 0
+    # only the club page that was not done is fetched again; its players are in the index
+    assert server.stats()["requests"] - before == 1
+    checkpoint = ScrapeCheckpoint()
+    assert checkpoint.todo("eredivisie", SEASON, clubs) == []
+    assert all(status == DONE for (status,) in checkpoint.db.execute("SELECT status FROM urls WHERE kind = 'club'"))
+    checkpoint.close()
@@ -0,0 +1,63 @@
+"""
+Incremental build of the top 7 table (FBref_top7.py) over a dataset converted from the
+league CSVs: only the changed seasons are read and rewritten, and the result, CSV
+included, is the one of a full build.
+"""
+import pytest
+
+from scraping_data.codes import FBref_top7
+from scraping_data.codes.FBref_engine import LEAGUES
+from scraping_data.codes.FBref_top7 import Top7Index, build_top7
+from scraping_data.codes.dataset import convert_csv, read_partition, write_partition
+
+
+LEAGUES_TOP7 = ["eredivisie", "primeiraliga"]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = str(tmp_path / "dataset")
+    for key in LEAGUES_TOP7:
+        convert_csv(LEAGUES[key], root=root)
+    return root
+
+
+def build(tmp_path, root, name, full=False):
+    index = Top7Index(str(tmp_path / f"{name}.sqlite"))
+    try:
+        return build_top7(
+            LEAGUES_TOP7, root, str(tmp_path / name), index=index, csv_path=str(tmp_path / f"{name}.csv"), full=full
+        )
+    finally:
+        index.close()
+
+
+def test_incremental_build_only_rewrites_the_changed_season(tmp_path, dataset, monkeypatch):
+    seasons = build(tmp_path, dataset, "top7")
+    assert len(seasons) > 1
+    season = seasons[-1]
+
+    rows = read_partition("eredivisie", season, dataset)
+    rows.loc[0, "Age"] = rows.loc[0, "Age"] + 1
+    write_partition("eredivisie", season, rows, dataset)
+
+    read = []
+    read_players_stats = FBref_top7.read_players_stats
+    monkeypatch.setattr(
+        FBref_top7,
+        "read_players_stats",
+        lambda seasons=None, **kwargs: read.append(seasons) or read_players_stats(seasons=seasons, **kwargs),
+    )
+    assert build(tmp_path, dataset, "top7") == [season]
+    assert read == [[season]]
+
+    # the same as a full build into another table
+    monkeypatch.setattr(FBref_top7, "read_players_stats", read_players_stats)
+    assert build(tmp_path, dataset, "full", full=True) == seasons
+    with open(tmp_path / "top7.csv") as incremental, open(tmp_path / "full.csv") as full:
+        assert incremental.read() == full.read()
+
+
+def test_unchanged_partitions_are_not_merged_again(tmp_path, dataset):
+    assert build(tmp_path, dataset, "top7")
+    assert build(tmp_path, dataset, "top7") == []
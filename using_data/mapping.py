@@ -1,25 +1,37 @@
-import requests
+"""
+Stadium of every club of the French leagues, crawled from Wikipedia, and their map.
+
+Usage (from the repository root):
+    python -m using_data.mapping [--divisions L1 L2] [--output using_data/stades.csv] [--map stadiums_map.html] [--full]
+
+The clubs and stadiums are kept in a store (stadium_store.py) and the command line only
+crawls again the clubs whose article changed, or that joined a division, before writing
+the CSV, and the map (stadium_map.py) when it changed. Importing the module does no
+request: the crawl only runs from crawl_stadiums, refresh_stadiums or the command line.
+"""
+from urllib.parse import unquote, urlencode, urlsplit
+import argparse
 import bs4
 import pandas as pd
-import geopandas as gpd
-import folium
-import webbrowser
+import requests
 import os
+import time
 
-def retrieve_page(url: str) -> bs4.BeautifulSoup:
-    """
-    Retrieves and parses a webpage using BeautifulSoup.
-
-    Args:
-        url (str): The URL of the webpage to retrieve.
+from scraping_data.codes.fetching import fetch_many
+from using_data.stadium_map import render_stadium_map
+from using_data.stadium_store import STADIUM_STORE, StadiumStore
 
-    Returns:
-        bs4.BeautifulSoup: The parsed HTML content of the page.
-    """
-    r = requests.get(url)
-    page = bs4.BeautifulSoup(r.content, "html.parser")
-    return page
+WIKIPEDIA = "http://fr.wikipedia.org"
+API_URL = "https://fr.wikipedia.org/w/api.php"
+# Titles per MediaWiki API query (the limit for anonymous clients)
+API_BATCH = 50
+# Wikipedia pages fetched at the same time by the crawler
+MAX_WORKERS = 8
 
+# Only the parts of each page the crawler reads are parsed
+TEAM_TAGS = bs4.SoupStrainer("span", {"class": "toponyme"})
+INFOBOX_ROWS = bs4.SoupStrainer("tr")
+MAP_LINKS = bs4.SoupStrainer("a", {"class": "mw-kartographer-maplink"})
 
 def extract_team_name_url(team: bs4.element.Tag) -> dict:
     """
@@ -34,7 +46,7 @@ def extract_team_name_url(team: bs4.element.Tag) -> dict:
     try:
         team_url = team.find("a").get("href")
         equipe = team.find("a").get("title")
-        url_get_info = f"http://fr.wikipedia.org{team_url}"
+        url_get_info = f"{WIKIPEDIA}{team_url}"
         print(f"Retrieving information for {equipe}")
         return {equipe: url_get_info}
     except AttributeError:
@@ -42,42 +54,26 @@ def extract_team_name_url(team: bs4.element.Tag) -> dict:
         return None
 
 
-def explore_team_page(wikipedia_team_url: str) -> bs4.BeautifulSoup:
-    """
-    Retrieves and parses a team's Wikipedia page.
-
-    Args:
-        wikipedia_team_url (str): The URL of the team's Wikipedia page.
-
-    Returns:
-        bs4.BeautifulSoup: The parsed HTML content of the team's Wikipedia page.
-    """
-    r = requests.get(wikipedia_team_url)
-    page = bs4.BeautifulSoup(r.content, "html.parser")
-    return page
-
-
-def extract_stadium_info(search_team: bs4.BeautifulSoup) -> tuple:
+def find_stadium(search_team: bs4.BeautifulSoup) -> tuple:
     """
-    Extracts stadium information from a team's Wikipedia page.
+    Finds the "Stade" row of a team's infobox.
 
     Args:
         search_team (bs4.BeautifulSoup): The parsed HTML content of the team's Wikipedia page.
 
     Returns:
-        tuple: A tuple containing the stadium name, latitude, and longitude, or (None, None, None) if not found.
+        tuple: A tuple containing the stadium name and its Wikipedia URL, or (None, None) if not found.
     """
-    for stadium in search_team.findAll("tr"):
+    for stadium in search_team.find_all("tr"):
         try:
             header = stadium.find("th", {"scope": "row"})
             if header and header.contents[0].string == "Stade":
                 name_stadium, url_get_stade = extract_stadium_name_url(stadium)
                 if name_stadium and url_get_stade:
-                    latitude, longitude = extract_stadium_coordinates(url_get_stade)
-                    return name_stadium, latitude, longitude
+                    return name_stadium, url_get_stade
         except (AttributeError, IndexError) as e:
             print(f"Error processing stadium information: {e}")
-    return None, None, None
+    return None, None
 
 
 def extract_stadium_name_url(stadium: bs4.element.Tag) -> tuple:
@@ -91,66 +87,149 @@ def extract_stadium_name_url(stadium: bs4.element.Tag) -> tuple:
         tuple: A tuple containing the stadium name and its Wikipedia URL, or (None, None) if not found.
     """
     try:
-        url_stade = stadium.findAll("a")[1].get("href")
-        name_stadium = stadium.findAll("a")[1].get("title")
-        url_get_stade = f"http://fr.wikipedia.org{url_stade}"
+        link = stadium.find_all("a", limit=2)[1]
+        url_stade = link.get("href")
+        name_stadium = link.get("title")
+        url_get_stade = f"{WIKIPEDIA}{url_stade}"
         return name_stadium, url_get_stade
     except (AttributeError, IndexError) as e:
         print(f"Error extracting stadium name and URL: {e}")
         return None, None
 
 
-def extract_stadium_coordinates(url_get_stade: str) -> tuple:
+def coordinates_from_page(soup_stade: bs4.BeautifulSoup) -> tuple:
     """
-    Extracts the coordinates of a stadium from its Wikipedia page.
+    Reads the coordinates of the map link of a stadium's Wikipedia page.
 
     Args:
-        url_get_stade (str): The URL of the stadium's Wikipedia page.
+        soup_stade (bs4.BeautifulSoup): The parsed HTML content of the stadium's Wikipedia page.
 
     Returns:
         tuple: A tuple containing the latitude and longitude of the stadium, or (None, None) if not found.
     """
-    try:
-        soup_stade = retrieve_page(url_get_stade)
-        kartographer = soup_stade.find("a", {"class": "mw-kartographer-maplink"})
-        if kartographer:
-            coordinates = (
-                kartographer.get("data-lat") + "," + kartographer.get("data-lon")
-            )
-            latitude, longitude = coordinates.split(",")
-            return latitude.strip(), longitude.strip()
-        else:
-            return None, None
-    except Exception as e:
-        print(f"Error extracting stadium coordinates: {e}")
-        return None, None
+    kartographer = soup_stade.find("a", {"class": "mw-kartographer-maplink"})
+    if kartographer and kartographer.get("data-lat") and kartographer.get("data-lon"):
+        return kartographer.get("data-lat").strip(), kartographer.get("data-lon").strip()
+    return None, None
 
 
-def extract_team_info(url_team_tag: bs4.element.Tag, division: str) -> dict:
+def title_from_url(url: str) -> str:
+    """
+    Returns the article title of a Wikipedia URL ("/wiki/Stade_de_France" -> "Stade de France"), or None.
     """
-    Extracts information about a team, including its stadium and coordinates.
+    path = urlsplit(url).path
+    if not path.startswith("/wiki/"):
+        return None
+    return unquote(path[len("/wiki/"):]).replace("_", " ")
+
+
+def api_query_url(titles: list, prop: str, api_url: str = API_URL) -> str:
+    """
+    Returns the MediaWiki API URL querying `prop` (e.g. "coordinates|info") for a batch of titles.
+    """
+    params = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "prop": prop,
+        "redirects": 1,
+        "titles": "|".join(titles),
+    }
+    if "coordinates" in prop.split("|"):
+        params.update({"coprimary": "primary", "colimit": "max"})
+    return f"{api_url}?{urlencode(params)}"
+
+
+def read_query(titles: list, data: dict) -> dict:
+    """
+    Maps the titles of a query to the pages of the API answer, following title
+    normalization then redirects.
+
+    Returns:
+        dict: A dictionary mapping each title to its page (a dictionary), or None for a missing article.
+    """
+    query = data.get("query", {})
+    targets = {}
+    for step in ("normalized", "redirects"):
+        for change in query.get(step, []):
+            targets[change["from"]] = change["to"]
+    pages = {page["title"]: page for page in query.get("pages", [])}
+    found = {}
+    for title in titles:
+        target = targets.get(title, title)
+        page = pages.get(targets.get(target, target))
+        found[title] = None if page is None or page.get("missing") or "pageid" not in page else page
+    return found
+
+
+def query_pages(titles: list, prop: str, api_url: str = API_URL, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Queries the MediaWiki API about articles, API_BATCH titles per request.
 
     Args:
-        url_team_tag (bs4.element.Tag): The BeautifulSoup tag containing the team information.
-        division (str): Team league
+        titles (list): The article titles, duplicates allowed.
+        prop (str): The properties asked, e.g. "info" for the page ids and last revision ids.
+        api_url (str): The URL of the MediaWiki API.
+        max_workers (int): The maximum number of requests in flight.
 
     Returns:
-        dict: A dictionary with details about the team, including its division, name, stadium, latitude, and longitude.
-    """
-
-    team_info = extract_team_name_url(url_team_tag)
-    url_team_wikipedia = next(iter(team_info.values()))
-    name_team = next(iter(team_info.keys()))
-    search_team = explore_team_page(url_team_wikipedia)
-    name_stadium, latitude, longitude = extract_stadium_info(search_team)
-    dict_stadium_team = {
-        "division": division,
-        "equipe": name_team,
-        "stade": name_stadium,
-        "latitude": latitude,
-        "longitude": longitude,
+        dict: A dictionary mapping each title to its page, or None for a missing article. The titles of failed queries are left out.
+    """
+    titles = list(dict.fromkeys(titles))
+    batches = {
+        api_query_url(titles[i:i + API_BATCH], prop, api_url): titles[i:i + API_BATCH]
+        for i in range(0, len(titles), API_BATCH)
     }
-    return dict_stadium_team
+    found = {}
+    for url, response in fetch_many(list(batches), max_workers=max_workers):
+        try:
+            response.raise_for_status()
+            found.update(read_query(batches[url], response.json()))
+        except (AttributeError, ValueError, requests.RequestException) as e:
+            print(f"Error querying {len(batches[url])} articles: {e}")
+    return found
+
+
+class CoordinateResolver:
+    """
+    Resolves the coordinates of Wikipedia articles through the MediaWiki API
+    (prop=coordinates), API_BATCH titles per request, with the results cached by page id.
+
+    Args:
+        api_url (str): The URL of the MediaWiki API.
+    """
+
+    def __init__(self, api_url: str = API_URL):
+        self.api_url = api_url
+        self.page_ids = {}  # title -> page id, None for a missing article
+        self.coordinates = {}  # page id -> (latitude, longitude), (None, None) without coordinates
+        self.revisions = {}  # page id -> last revision id
+
+    def resolve(self, titles: list, max_workers: int = MAX_WORKERS) -> dict:
+        """
+        Returns the coordinates of articles, asking the API only for the titles not cached yet.
+
+        Args:
+            titles (list): The article titles.
+            max_workers (int): The maximum number of requests in flight.
+
+        Returns:
+            dict: A dictionary mapping each title to its (latitude, longitude), or (None, None) if unknown.
+        """
+        unknown = [title for title in titles if title not in self.page_ids]
+        # titles of failed queries stay unknown: asked again next time, and scraped from the article meanwhile
+        for title, page in query_pages(unknown, "coordinates|info", self.api_url, max_workers).items():
+            self.page_ids[title] = page["pageid"] if page else None
+            if page:
+                coordinates = page.get("coordinates")
+                self.coordinates[page["pageid"]] = (
+                    (float(coordinates[0]["lat"]), float(coordinates[0]["lon"])) if coordinates else (None, None)
+                )
+                self.revisions[page["pageid"]] = page.get("lastrevid")
+        return {
+            title: self.coordinates.get(self.page_ids.get(title), (None, None))
+            for title in titles
+        }
 
 
 def retrieve_all_stadium_from_league(
@@ -166,15 +245,255 @@ def retrieve_all_stadium_from_league(
     Returns:
         pd.DataFrame: A DataFrame containing information about the stadiums in the specified division.
     """
-    page = retrieve_page(url_list[division])
-    teams = page.findAll("span", {"class": "toponyme"})
+    return crawl_stadiums(url_list, [division])
+
+
+def fetch_pages(urls: list, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Fetches several pages concurrently through the shared session and the response cache,
+    within the rate limit of Wikipedia. Each URL is requested once.
+
+    Args:
+        urls (list): The URLs of the pages, duplicates allowed.
+        max_workers (int): The maximum number of requests in flight.
+
+    Returns:
+        dict: A dictionary mapping each URL to the page content (bytes), or None if the request failed.
+    """
+    pages = {}
+    for url, response in fetch_many(list(dict.fromkeys(urls)), max_workers=max_workers):
+        if response is None or response.status_code != 200:
+            print(f"Could not retrieve {url}")
+            pages[url] = None
+        else:
+            pages[url] = response.content
+    return pages
+
+
+def league_listings(url_list: dict, divisions: list, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Lists the teams of several divisions from their league pages, fetched concurrently.
+
+    Returns:
+        dict: A dictionary mapping each division to its (team name, team Wikipedia URL) tuples, or None if its page could not be retrieved.
+    """
+    league_pages = fetch_pages([url_list[division] for division in divisions], max_workers)
+    listings = {}
+    for division in divisions:
+        content = league_pages[url_list[division]]
+        if content is None:
+            listings[division] = None
+            continue
+        page = bs4.BeautifulSoup(content, "html.parser", parse_only=TEAM_TAGS)
+        listings[division] = []
+        for team in page.find_all("span", {"class": "toponyme"}):
+            team_info = extract_team_name_url(team)
+            if team_info:
+                listings[division].append(next(iter(team_info.items())))
+    return listings
+
+
+def league_teams(url_list: dict, divisions: list, max_workers: int = MAX_WORKERS) -> list:
+    """
+    Lists the teams of several divisions from their league pages, fetched concurrently.
+
+    Returns:
+        list: A list of (division, team name, team Wikipedia URL) tuples.
+    """
+    return [
+        (division, name_team, url_team_wikipedia)
+        for division, teams in league_listings(url_list, divisions, max_workers).items()
+        for name_team, url_team_wikipedia in teams or []
+    ]
+
+
+def team_stadiums(team_urls: list, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Finds the stadium of several teams from their pages, fetched concurrently.
+
+    Returns:
+        dict: A dictionary mapping each team URL to (stadium name, stadium URL), (None, None) if not found,
+        or None if the team page could not be retrieved.
+    """
+    return {
+        url: find_stadium(bs4.BeautifulSoup(content, "html.parser", parse_only=INFOBOX_ROWS))
+        if content else None
+        for url, content in fetch_pages(team_urls, max_workers).items()
+    }
+
+
+def stadium_coordinates(stadium_urls: list, resolver: CoordinateResolver, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Resolves the coordinates of several stadiums through the MediaWiki API, 50 stadiums
+    per request; the pages of the stadiums it has no coordinates for are scraped instead.
+
+    Returns:
+        dict: A dictionary mapping each stadium URL to (latitude, longitude), (None, None) if not found,
+        or None if the API had none and the stadium page could not be retrieved.
+    """
+    stadium_titles = {url: title_from_url(url) for url in stadium_urls}
+    resolved = resolver.resolve([title for title in stadium_titles.values() if title], max_workers)
+    coordinates = {url: resolved.get(title, (None, None)) for url, title in stadium_titles.items()}
+
+    # Fallback: the map link of the stadium pages, fetched once however many teams play there
+    missing = [url for url, (latitude, _) in coordinates.items() if latitude is None]
+    for url, content in fetch_pages(missing, max_workers).items():
+        if content:
+            latitude, longitude = coordinates_from_page(bs4.BeautifulSoup(content, "html.parser", parse_only=MAP_LINKS))
+            try:
+                coordinates[url] = (float(latitude), float(longitude)) if latitude else (None, None)
+            except ValueError:
+                # a map link whose coordinates are not numbers: the stadium stays unresolved
+                coordinates[url] = (None, None)
+        else:
+            coordinates[url] = None
+    return coordinates
+
+
+def crawl_stadiums(
+    url_list: dict, divisions: list = None, max_workers: int = MAX_WORKERS, resolver: CoordinateResolver = None
+) -> pd.DataFrame:
+    """
+    Retrieves the stadium of every team of several leagues, fetching the league pages,
+    then the team pages, concurrently, and resolving the stadium coordinates in batches.
+
+    Args:
+        url_list (dict): A dictionary mapping divisions to their Wikipedia URLs.
+        divisions (list): The divisions to crawl, all those of url_list by default.
+        max_workers (int): The maximum number of requests in flight.
+        resolver (CoordinateResolver): The coordinate resolver (and its cache), a new one by default.
+
+    Returns:
+        pd.DataFrame: A DataFrame with the division, team, stadium, latitude and longitude of every team.
+    """
+    divisions = divisions or list(url_list)
+    teams = league_teams(url_list, divisions, max_workers)
+    stadiums = team_stadiums([url for _, _, url in teams], max_workers)
+    coordinates = stadium_coordinates(
+        [stadium[1] for stadium in stadiums.values() if stadium and stadium[1]], resolver or CoordinateResolver(), max_workers
+    )
+
     all_info = []
+    for division, name_team, url_team_wikipedia in teams:
+        name_stadium, url_get_stade = stadiums[url_team_wikipedia] or (None, None)
+        latitude, longitude = coordinates.get(url_get_stade) or (None, None)
+        all_info.append({
+            "division": division,
+            "equipe": name_team,
+            "stade": name_stadium,
+            "latitude": latitude,
+            "longitude": longitude,
+        })
+    stadium_df = pd.DataFrame(all_info, columns=["division", "equipe", "stade", "latitude", "longitude"])
+    return stadium_df.astype({"latitude": "float64", "longitude": "float64"})
+
+
+def refresh_stadiums(
+    url_list: dict,
+    divisions: list = None,
+    store: StadiumStore = None,
+    max_workers: int = MAX_WORKERS,
+    resolver: CoordinateResolver = None,
+) -> pd.DataFrame:
+    """
+    Updates the stadium store with the teams of several leagues. The league pages are
+    fetched again, then the last revision of every team article, and of the stadium
+    articles already stored, is asked to the MediaWiki API; only the teams that are new
+    to the store or whose article (or stadium article) changed are crawled again.
 
-    for team in teams:
-        all_info.append(extract_team_info(team, division))
+    Args:
+        url_list (dict): A dictionary mapping divisions to their Wikipedia URLs.
+        divisions (list): The divisions to refresh, all those of url_list by default.
+        store (StadiumStore): The stadium store, the default one by default.
+        max_workers (int): The maximum number of requests in flight.
+        resolver (CoordinateResolver): The coordinate resolver (and its cache), a new one by default.
+
+    Returns:
+        pd.DataFrame: The stored teams of the divisions, typed as in STORE_DTYPES.
+    """
+    divisions = divisions or list(url_list)
+    store = store or StadiumStore()
+    resolver = resolver or CoordinateResolver()
+
+    listings = league_listings(url_list, divisions, max_workers)
+    teams = [
+        (division, name_team, url_team_wikipedia)
+        for division, division_teams in listings.items()
+        for name_team, url_team_wikipedia in division_teams or []
+    ]
+    club_titles = {url: title_from_url(url) for _, _, url in teams}
+    club_pages = query_pages([title for title in club_titles.values() if title], "info", resolver.api_url, max_workers)
+    # a division whose page, or the page id of one of its teams, could not be retrieved
+    # keeps its stored clubs: they are not dropped from it for a failed request
+    complete = [
+        division for division, division_teams in listings.items()
+        if division_teams is not None and all(
+            club_titles[url] is None or club_titles[url] in club_pages for _, url in division_teams
+        )
+    ]
+    for division in divisions:
+        if division not in complete:
+            print(f"{division}: incomplete listing, its stored clubs are kept")
+    known = store.revisions()
+    # revisions of the stored stadiums, with their coordinates in the same requests
+    resolver.resolve([stadium_title for _, stadium_title, _ in known.values() if stadium_title], max_workers)
+
+    members, stale = {}, []
+    for division, name_team, url_team_wikipedia in teams:
+        page = club_pages.get(club_titles[url_team_wikipedia])
+        if page is None:
+            if club_titles[url_team_wikipedia] in club_pages:
+                print(f"No Wikipedia page id for {name_team}, not stored")
+            continue
+        members[page["pageid"]] = division
+        club_revision, stadium_title, stadium_revision = known.get(page["pageid"], (None, None, None))
+        stadium_page_id = resolver.page_ids.get(stadium_title)
+        if (
+            page["pageid"] not in known
+            or club_revision != page.get("lastrevid")
+            or (stadium_title and resolver.revisions.get(stadium_page_id, stadium_revision) != stadium_revision)
+        ):
+            stale.append((division, name_team, url_team_wikipedia, page))
+    print(f"{len(stale)} of {len(members)} teams to crawl again")
+
+    stadiums = team_stadiums([url for _, _, url, _ in stale], max_workers)
+    coordinates = stadium_coordinates(
+        [stadium[1] for stadium in stadiums.values() if stadium and stadium[1]], resolver, max_workers
+    )
+    fetched_at = time.time()
+    rows = []
+    for division, name_team, url_team_wikipedia, page in stale:
+        # a team whose page or stadium coordinates could not be retrieved keeps its stored
+        # row, and its stored revisions: the next refresh crawls it again
+        if stadiums[url_team_wikipedia] is None:
+            print(f"Could not crawl {name_team}, stored stadium kept")
+            continue
+        name_stadium, url_get_stade = stadiums[url_team_wikipedia]
+        if url_get_stade and coordinates.get(url_get_stade) is None:
+            print(f"Could not locate the stadium of {name_team}, stored stadium kept")
+            continue
+        stadium_title = title_from_url(url_get_stade) if url_get_stade else None
+        stadium_page_id = resolver.page_ids.get(stadium_title)
+        latitude, longitude = coordinates.get(url_get_stade) or (None, None)
+        rows.append({
+            "division": division,
+            "equipe": name_team,
+            "club_page_id": page["pageid"],
+            "club_title": page["title"],
+            "club_revision": page.get("lastrevid"),
+            "stade": name_stadium,
+            "stadium_title": stadium_title,
+            "stadium_page_id": stadium_page_id,
+            "stadium_revision": resolver.revisions.get(stadium_page_id),
+            "latitude": latitude,
+            "longitude": longitude,
+            "fetched_at": fetched_at,
+        })
+    store.upsert(rows)
+    store.set_divisions(complete, members)
+    store.commit()
+    return store.frame(divisions)
 
-    stadium_df = pd.DataFrame(all_info)
-    return stadium_df
 
 def save_dataframe_to_csv(dataframe, filename, folder_path):
     if not os.path.exists(folder_path):
@@ -192,9 +511,28 @@ url_list = {
     'L2': 'https://fr.wikipedia.org/wiki/Championnat_de_France_de_football_de_deuxi%C3%A8me_division_2024-2025',
 }
 
-# Retrieve stadiums information for Ligue 1
-stades_ligue1 = retrieve_all_stadium_from_league(url_list, 'L1')#Download the data
-stades_ligue2 = retrieve_all_stadium_from_league(url_list, 'L2')
 
-stades = pd.concat([stades_ligue1, stades_ligue2])
-save_dataframe_to_csv(stades, 'stades.csv', 'using_data') # Save the data to a CSV file
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--divisions', nargs='+', default=list(url_list), choices=list(url_list))
+    parser.add_argument('--output', default='using_data/stades.csv', help='CSV file of the stadiums')
+    parser.add_argument('--map', help='also render the map to this HTML file')
+    parser.add_argument('--store', default=STADIUM_STORE, help='SQLite stadium store')
+    parser.add_argument('--full', action='store_true', help='crawl every team again, not only the changed ones')
+    args = parser.parse_args()
+
+    # Refresh the stadiums information of Ligue 1 and Ligue 2
+    store = StadiumStore(args.store)
+    if args.full:
+        store.clear()
+    stades = refresh_stadiums(url_list, args.divisions, store)
+    folder_path, filename = os.path.split(args.output)
+    save_dataframe_to_csv(stades, filename, folder_path or '.')
+    if args.map:
+        # every division of the store, re-rendered only when its stadiums changed
+        render_stadium_map(store.frame(), args.map)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Distance features between clubs, from the stadium coordinates of the stadium store
+(see mapping.py and stadium_store.py).
+
+Transfermarkt clubs (clubs.csv, keyed by club_id) are matched to the stored stadiums on
+their stadium name, then on their club name. Distances are computed with a vectorized
+haversine over whole columns, and nearest-stadium queries go through a BallTree on
+radians, so that millions of transfers are handled without any Python loop.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from using_data.stadium_store import StadiumStore
+
+
+# Mean Earth radius (IUGG), in kilometers
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Great-circle distances between two sets of points, element-wise.
+
+    Args:
+        lat1, lon1, lat2, lon2 (array-like): Coordinates in degrees, NaN for unknown points.
+
+    Returns:
+        np.ndarray: The distances in kilometers, NaN where a point is unknown.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype="float64")) for values in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def normalise_names(names: pd.Series) -> pd.Series:
+    """
+    Matching key of club or stadium names: no accents, parenthesised words or punctuation, lower case.
+    """
+    return (
+        names.astype("string")
+        .str.replace(r"\([^)]*\)", " ", regex=True)
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def club_locations(clubs_df: pd.DataFrame, stadiums_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Matches Transfermarkt clubs to the stored stadiums, on the stadium name, then on the club name.
+
+    Args:
+        clubs_df (pd.DataFrame): The club data (club_id, name, stadium_name).
+        stadiums_df (pd.DataFrame): The stadiums, as returned by StadiumStore.frame (equipe, stade, latitude, longitude).
+
+    Returns:
+        pd.DataFrame: club_id, latitude and longitude (float64) of the clubs matched.
+    """
+    stadiums_df = stadiums_df.dropna(subset=["latitude", "longitude"])
+    clubs = pd.DataFrame({
+        "club_id": clubs_df["club_id"].to_numpy(),
+        "stadium_key": normalise_names(clubs_df["stadium_name"]).to_numpy(),
+        "club_key": normalise_names(clubs_df["name"]).to_numpy(),
+    })
+    located = []
+    for club_key, stadium_key in (("stadium_key", "stade"), ("club_key", "equipe")):
+        coordinates = pd.DataFrame({
+            club_key: normalise_names(stadiums_df[stadium_key]).to_numpy(),
+            "latitude": stadiums_df["latitude"].to_numpy("float64"),
+            "longitude": stadiums_df["longitude"].to_numpy("float64"),
+        }).dropna(subset=[club_key]).drop_duplicates(subset=[club_key])
+        located.append(clubs.merge(coordinates, on=club_key, how="inner")[["club_id", "latitude", "longitude"]])
+    # a match on the stadium name wins over one on the club name
+    return pd.concat(located, ignore_index=True).drop_duplicates(subset=["club_id"]).reset_index(drop=True)
+
+
+def load_club_locations(clubs_df: pd.DataFrame, store: StadiumStore = None) -> pd.DataFrame:
+    """
+    Returns the club_id, latitude and longitude of the clubs found in the stadium store (the default one by default).
+    """
+    store = store or StadiumStore()
+    return club_locations(clubs_df, store.frame())
+
+
+def add_transfer_distances(transfers_df: pd.DataFrame, locations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the stadium coordinates of the selling and buying clubs and the distance between them.
+
+    Args:
+        transfers_df (pd.DataFrame): Transfers with from_club_id and to_club_id, e.g. the output of merge_transfers_with_clubs.
+        locations (pd.DataFrame): club_id, latitude and longitude, as returned by club_locations.
+
+    Returns:
+        pd.DataFrame: The transfers with from_latitude, from_longitude, to_latitude, to_longitude and
+        transfer_distance_km columns, NaN for the clubs without a known stadium.
+    """
+    coordinates = locations.drop_duplicates(subset=["club_id"]).set_index("club_id")[["latitude", "longitude"]]
+    transfers_df = transfers_df.copy()
+    for side in ("from", "to"):
+        matched = coordinates.reindex(transfers_df[f"{side}_club_id"].to_numpy())
+        transfers_df[f"{side}_latitude"] = matched["latitude"].to_numpy()
+        transfers_df[f"{side}_longitude"] = matched["longitude"].to_numpy()
+    transfers_df["transfer_distance_km"] = haversine_km(
+        transfers_df["from_latitude"], transfers_df["from_longitude"],
+        transfers_df["to_latitude"], transfers_df["to_longitude"],
+    )
+    return transfers_df
+
+
+class StadiumIndex:
+    """
+    BallTree over the stadium coordinates of clubs (haversine metric, on radians).
+
+    Args:
+        locations (pd.DataFrame): club_id, latitude and longitude, as returned by club_locations.
+    """
+
+    def __init__(self, locations: pd.DataFrame):
+        locations = locations.dropna(subset=["latitude", "longitude"]).drop_duplicates(subset=["club_id"])
+        self.club_ids = locations["club_id"].to_numpy()
+        self.tree = BallTree(np.radians(locations[["latitude", "longitude"]].to_numpy("float64")), metric="haversine")
+
+    def query(self, latitudes, longitudes, k: int = 1) -> tuple:
+        """
+        Returns the k clubs whose stadium is the nearest to each point.
+
+        Args:
+            latitudes, longitudes (array-like): Coordinates of the points, in degrees.
+            k (int): The number of clubs per point.
+
+        Returns:
+            tuple: (distances in kilometers, club ids), two arrays of shape (points, k), nearest first.
+        """
+        points = np.radians(np.column_stack([latitudes, longitudes]).astype("float64"))
+        distances, positions = self.tree.query(points, k=min(k, len(self.club_ids)))
+        return distances * EARTH_RADIUS_KM, self.club_ids[positions]
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        """Returns the ids of the clubs whose stadium is within radius_km of a point."""
+        positions = self.tree.query_radius(np.radians([[latitude, longitude]]), r=radius_km / EARTH_RADIUS_KM)[0]
+        return self.club_ids[positions]
+
+    def nearest_rivals(self, k: int = 3) -> pd.DataFrame:
+        """
+        Returns the k nearest other clubs of every club (clubs sharing a stadium are at 0 km).
+
+        Returns:
+            pd.DataFrame: club_id, rank (1 for the nearest), rival_club_id and distance_km, one row per pair.
+        """
+        k = min(k, len(self.club_ids) - 1)
+        if k < 1:
+            return pd.DataFrame(columns=["club_id", "rank", "rival_club_id", "distance_km"])
+        points = np.asarray(self.tree.data)
+        distances, positions = self.tree.query(points, k=k + 1)
+        # drop each club from its own neighbours, keeping the order of the others
+        others = positions != np.arange(len(positions))[:, None]
+        order = np.argsort(~others, axis=1, kind="stable")[:, :k]
+        positions = np.take_along_axis(positions, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        return pd.DataFrame({
+            "club_id": np.repeat(self.club_ids, k),
+            "rank": np.tile(np.arange(1, k + 1), len(self.club_ids)),
+            "rival_club_id": self.club_ids[positions].ravel(),
+            "distance_km": (distances * EARTH_RADIUS_KM).ravel(),
+        })
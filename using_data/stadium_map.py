@@ -0,0 +1,182 @@
+"""
+Map of the club stadiums, rendered from the stadium store (see stadium_store.py).
+
+Usage (from the repository root):
+    python -m using_data.stadium_map [--store using_data/stadiums.sqlite] [--output stadiums_map.html] [--open]
+
+The page is a fixed Leaflet template plus one compact GeoJSON layer of the stadiums:
+markers are built, clustered (Leaflet.markercluster) and grouped by division in the
+browser, with a layer control to show or hide each division. The file size grows by
+about a hundred bytes per club and the page does not inline any marker HTML. The
+digest of the layer is kept in the page, so rendering the same stadiums again leaves
+the file untouched.
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from using_data.stadium_store import STADIUM_STORE, StadiumStore
+
+
+LEAFLET = "https://unpkg.com/leaflet@1.9.4/dist"
+MARKERCLUSTER = "https://unpkg.com/leaflet.markercluster@1.5.3/dist"
+DIGEST_META = '<meta name="stadium-layer-digest" content="{digest}">'
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+{digest_meta}
+<title>Stadiums</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="{leaflet}/leaflet.css">
+<link rel="stylesheet" href="{markercluster}/MarkerCluster.css">
+<link rel="stylesheet" href="{markercluster}/MarkerCluster.Default.css">
+<script src="{leaflet}/leaflet.js"></script>
+<script src="{markercluster}/leaflet.markercluster.js"></script>
+<style>
+html, body, #map {{ height: 100%; margin: 0; }}
+.division-dot {{ border-radius: 50%; border: 2px solid #fff; box-shadow: 0 0 2px #333; }}
+</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const stadiums = {layer};
+const colors = ["#2a6fdb", "#2e9e44", "#d9822b", "#c23b3b", "#8e44ad", "#16a2a2", "#b5a300", "#5d6d7e"];
+const map = L.map("map", {{preferCanvas: true}});
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  maxZoom: 18, attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(map);
+
+const divisions = {{}};
+function divisionLayer(division) {{
+  if (!(division in divisions)) {{
+    const color = colors[Object.keys(divisions).length % colors.length];
+    divisions[division] = {{color: color, layer: L.markerClusterGroup({{chunkedLoading: true}})}};
+  }}
+  return divisions[division];
+}}
+function popup(properties) {{
+  const content = document.createElement("div");
+  const club = document.createElement("b");
+  club.textContent = properties.club;
+  content.append(club, document.createElement("br"), properties.stadium || "");
+  return content;
+}}
+L.geoJSON(stadiums, {{
+  pointToLayer: function (feature, latlng) {{
+    const division = divisionLayer(feature.properties.division);
+    const icon = L.divIcon({{className: "", html: '<div class="division-dot" style="width:12px;height:12px;background:' + division.color + '"></div>', iconSize: [16, 16]}});
+    const marker = L.marker(latlng, {{icon: icon}}).bindPopup(function () {{ return popup(feature.properties); }});
+    division.layer.addLayer(marker);
+    return marker;
+  }}
+}});
+const overlays = {{}};
+Object.keys(divisions).sort().forEach(function (division) {{
+  divisions[division].layer.addTo(map);
+  overlays['<span style="color:' + divisions[division].color + '">&#9679;</span> ' + division] = divisions[division].layer;
+}});
+L.control.layers(null, overlays, {{collapsed: false}}).addTo(map);
+const bounds = L.latLngBounds(stadiums.features.map(function (f) {{ return [f.geometry.coordinates[1], f.geometry.coordinates[0]]; }}));
+if (bounds.isValid()) {{ map.fitBounds(bounds, {{padding: [20, 20]}}); }} else {{ map.setView([46.6, 2.4], 6); }}
+</script>
+</body>
+</html>
+"""
+
+
+def stadium_layer(stades: pd.DataFrame) -> str:
+    """
+    Builds the GeoJSON layer of the stadiums: one point per club, with its division, club and stadium names.
+
+    Args:
+        stades (pd.DataFrame): The stadiums, as returned by StadiumStore.frame or crawl_stadiums.
+
+    Returns:
+        str: The compact GeoJSON FeatureCollection.
+    """
+    stades = stades.dropna(subset=["latitude", "longitude"]).sort_values(["division", "equipe"])
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(longitude, 6), round(latitude, 6)]},
+            "properties": {"division": division, "club": club, "stadium": stadium},
+        }
+        for division, club, stadium, latitude, longitude in zip(
+            stades["division"].astype("string").fillna("").tolist(),
+            stades["equipe"].astype("string").fillna("").tolist(),
+            stades["stade"].astype("object").where(stades["stade"].notna(), None).tolist(),
+            stades["latitude"].astype("float64").tolist(),
+            stades["longitude"].astype("float64").tolist(),
+        )
+    ]
+    return json.dumps({"type": "FeatureCollection", "features": features}, ensure_ascii=False, separators=(",", ":"))
+
+
+def rendered_digest(path: str) -> str:
+    """Returns the layer digest recorded in an existing map, or None."""
+    if not os.path.exists(path):
+        return None
+    prefix, suffix = DIGEST_META.split("{digest}")
+    with open(path, encoding="utf-8") as f:
+        head = f.read(1024)
+    start = head.find(prefix)
+    if start < 0:
+        return None
+    start += len(prefix)
+    end = head.find(suffix, start)
+    return head[start:end] if end > start else None
+
+
+def render_stadium_map(stades: pd.DataFrame, path: str = "stadiums_map.html", open_browser: bool = False) -> bool:
+    """
+    Writes the stadium map, unless the existing file already shows the same stadiums.
+
+    Args:
+        stades (pd.DataFrame): The stadiums, as returned by StadiumStore.frame or crawl_stadiums.
+        path (str): The HTML file the map is saved to.
+        open_browser (bool): Whether to open the map in the web browser.
+
+    Returns:
+        bool: Whether the file was (re)written.
+    """
+    layer = stadium_layer(stades)
+    digest = hashlib.sha256(layer.encode("utf-8")).hexdigest()
+    written = rendered_digest(path) != digest
+    if written:
+        page = PAGE_TEMPLATE.format(
+            digest_meta=DIGEST_META.format(digest=digest),
+            leaflet=LEAFLET,
+            markercluster=MARKERCLUSTER,
+            # "</" would end the script element
+            layer=layer.replace("</", "<\\/"),
+        )
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(page)
+        os.replace(path + ".tmp", path)
+    if open_browser:
+        import webbrowser
+        webbrowser.open("file://" + os.path.abspath(path))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=STADIUM_STORE, help='SQLite stadium store')
+    parser.add_argument('--output', default='stadiums_map.html', help='HTML file of the map')
+    parser.add_argument('--open', action='store_true', help='open the map in the web browser')
+    args = parser.parse_args()
+
+    store = StadiumStore(args.store)
+    written = render_stadium_map(store.frame(), args.output, args.open)
+    store.close()
+    print(f"{args.output} {'written' if written else 'unchanged'}")
+
+
+if __name__ == '__main__':
+    main()
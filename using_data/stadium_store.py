@@ -0,0 +1,127 @@
+"""
+Persistent store of the club stadiums crawled from Wikipedia (see mapping.refresh_stadiums).
+
+One row per club, keyed by the Wikipedia page id of the club article, with its stadium,
+the page id and coordinates of the stadium article, the revision ids both were read
+from and the fetch time. A refresh only crawls again the clubs whose article (or
+stadium article) changed since, and those that joined a division.
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+
+STADIUM_STORE = "using_data/stadiums.sqlite"
+
+# Columns of the store, with the dtypes of the frames it returns
+STORE_DTYPES = {
+    "division": "string",
+    "equipe": "string",
+    "club_page_id": "Int64",
+    "club_title": "string",
+    "club_revision": "Int64",
+    "stade": "string",
+    "stadium_title": "string",
+    "stadium_page_id": "Int64",
+    "stadium_revision": "Int64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "fetched_at": "float64",
+}
+
+
+class StadiumStore:
+    """
+    SQLite store of the clubs and their stadiums, indexed by club page id, club name
+    and stadium page id. `division` is the division the club was last listed in, NULL
+    once it is no longer listed in any of the divisions crawled.
+
+    Args:
+        path (str): The SQLite file of the store.
+    """
+
+    def __init__(self, path: str = STADIUM_STORE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS stadiums (
+                club_page_id INTEGER PRIMARY KEY,
+                division TEXT,
+                equipe TEXT NOT NULL,
+                club_title TEXT NOT NULL,
+                club_revision INTEGER,
+                stade TEXT,
+                stadium_title TEXT,
+                stadium_page_id INTEGER,
+                stadium_revision INTEGER,
+                latitude REAL,
+                longitude REAL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS stadiums_equipe ON stadiums (equipe)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS stadiums_stadium ON stadiums (stadium_page_id)")
+        self.db.commit()
+
+    def revisions(self) -> dict:
+        """
+        Returns:
+            dict: A dictionary mapping each club page id to (club revision, stadium title, stadium revision).
+        """
+        return {
+            club_page_id: (club_revision, stadium_title, stadium_revision)
+            for club_page_id, club_revision, stadium_title, stadium_revision in self.db.execute(
+                "SELECT club_page_id, club_revision, stadium_title, stadium_revision FROM stadiums"
+            )
+        }
+
+    def upsert(self, rows: list):
+        """Inserts or replaces club rows (dictionaries with the STORE_DTYPES keys)."""
+        columns = list(STORE_DTYPES)
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO stadiums ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [tuple(row.get(column) for column in columns) for row in rows],
+        )
+
+    def set_divisions(self, divisions: list, members: dict):
+        """
+        Records the division of the clubs listed: `members` maps their club page ids to
+        their division. The other clubs of `divisions`, the divisions whose listing is
+        complete, lose it (relegated, promoted away); those of other divisions keep it.
+        """
+        if divisions:
+            placeholders = ", ".join("?" * len(divisions))
+            self.db.execute(f"UPDATE stadiums SET division = NULL WHERE division IN ({placeholders})", list(divisions))
+        self.db.executemany(
+            "UPDATE stadiums SET division = ? WHERE club_page_id = ?",
+            [(division, club_page_id) for club_page_id, division in members.items()],
+        )
+
+    def frame(self, divisions: list = None) -> pd.DataFrame:
+        """
+        Returns the clubs of `divisions` (every club listed in a division by default) as a typed DataFrame.
+        """
+        query = f"SELECT {', '.join(STORE_DTYPES)} FROM stadiums"
+        if divisions:
+            query += f" WHERE division IN ({', '.join('?' * len(divisions))})"
+            params = list(divisions)
+        else:
+            query += " WHERE division IS NOT NULL"
+            params = []
+        frame = pd.read_sql_query(query + " ORDER BY division, equipe", self.db, params=params)
+        return frame.astype(STORE_DTYPES)
+
+    def clear(self):
+        self.db.execute("DELETE FROM stadiums")
+        self.db.commit()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()